@@ -0,0 +1,72 @@
+"""
+Casting a `List[Union[int, str]]` of 10k elements with the recursive `cast`
+interpreter water used to have vs a pre-compiled cast plan.
+
+    python -m benchmarks.bench_cast
+"""
+import enum
+import time
+from typing import Any, List, Tuple, Union
+
+from water_cli.exceptions import InvalidChoice
+from water_cli.parser import MCallable, Repeated, typing_get_args, typing_get_origin
+
+ELEMENTS = 10_000
+ROUNDS = 20
+
+
+def legacy_cast(key: str, value: Any, annotation: Any) -> Any:
+    origin = typing_get_origin(annotation)
+    args = typing_get_args(annotation)
+    if origin == Union:
+        for arg in args:
+            try:
+                value = legacy_cast(key, value, arg)
+                break
+            except Exception:
+                continue
+    elif origin in [list, tuple, List, Tuple]:
+        value = value.split(',')
+        if len(args):
+            value = [legacy_cast(key, i, args[0]) for i in value]
+    elif origin == Repeated:
+        value = [legacy_cast(key, i, args[0]) for i in value]
+    elif annotation in [int, float]:
+        value = annotation(value)
+    elif annotation is bool:
+        value = value.lower() in ['true', '1', 't', 'y', 'yes']
+    elif issubclass(annotation, enum.Enum):
+        if value not in annotation._member_names_:
+            raise InvalidChoice(key, value, annotation._member_names_)
+        value = annotation[value]
+    return value
+
+
+def items(numbers: List[Union[int, str]]) -> None:
+    pass
+
+
+def timed(fn: Any) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> None:
+    value = ','.join(str(i) if i % 2 else f'x{i}' for i in range(ELEMENTS))
+    c = MCallable.from_callable(items, 'items', parent=None)
+    annotation = c.args[0].annotation
+
+    legacy = timed(lambda: legacy_cast('numbers', value, annotation))
+    convert, _ = c.cast_plan()['numbers']
+    compiled = timed(lambda: convert(value))
+    assert convert(value) == legacy_cast('numbers', value, annotation)
+
+    print(f'List[Union[int, str]], {ELEMENTS} elements')
+    print(f'  legacy cast:   {legacy * 1e3:8.2f} ms')
+    print(f'  compiled plan: {compiled * 1e3:8.2f} ms ({legacy / compiled:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Per-call cost of `execute_command`, rebuilding the tree on every call vs re-using
+the compiled tree.
+
+    python -m benchmarks.bench_compile
+"""
+import time
+
+from benchmarks.synthetic import make_flat_cli
+from water_cli.parser import execute_command, invalidate
+
+SIZES = [10, 100, 1_000, 10_000]
+CALLS = 200
+
+
+def per_call(root: type, rebuild: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        if rebuild:
+            invalidate(root)
+        execute_command(root, 'cmd_0 --a 1')
+    return (time.perf_counter() - start) / CALLS
+
+
+def main() -> None:
+    print(f"{'commands':>10} {'rebuild (us)':>14} {'compiled (us)':>14}")
+    for size in SIZES:
+        root = make_flat_cli(size)
+        rebuild = per_call(root, rebuild=True)
+        compiled = per_call(root, rebuild=False)
+        print(f'{size:>10} {rebuild * 1e6:>14.1f} {compiled * 1e6:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Latency of running one command cold (a new interpreter importing the CLI) vs through
+a daemon, both from a new client interpreter and from an already running process.
+
+    python -m benchmarks.bench_daemon
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, List
+
+from examples import calculator
+from water_cli.client import call
+from water_cli.daemon import make_server
+
+ROUNDS = 20
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn: Any) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def run(cmd: List[str]) -> None:
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONPATH=ROOT))
+
+
+def main() -> None:
+    argv = ['double', '--number', '2']
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'sock')
+        with make_server(calculator.Calculator, path) as server:
+            t = threading.Thread(target=server.serve_forever)
+            t.start()
+            try:
+                cold = timed(lambda: run([sys.executable, os.path.join(ROOT, 'examples', 'calculator.py')] + argv))
+                client = timed(lambda: run([sys.executable, os.path.join(ROOT, 'water_cli', 'client.py'), path] + argv))
+                in_process = timed(lambda: call(path, argv))
+            finally:
+                server.shutdown()
+                t.join()
+
+    print(f'cold invocation:   {cold * 1e3:8.2f} ms')
+    print(f'daemon, CLI client: {client * 1e3:7.2f} ms')
+    print(f'daemon, in-process: {in_process * 1e3:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
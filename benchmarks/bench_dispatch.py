@@ -0,0 +1,62 @@
+"""
+Per-call cost of resolving the last command of the deepest level of wide trees, scanning
+the names of every level vs the name index `Namespace.find` builds once; and of resolving
+`mig`, an abbreviation of the root level `migrate` command.
+
+    python -m benchmarks.bench_dispatch
+"""
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from benchmarks.synthetic import _command, make_cli
+from water_cli.parser import MCallable, Namespace, _resolve, compile
+
+# width x depth; the widest tree has 20k commands on its deepest level
+TREES = [(10, 3), (100, 3), (20_000, 1)]
+CALLS = 2_000
+
+
+def scan(ns: Namespace, name: str) -> Optional[Union[Namespace, MCallable]]:
+    for m in ns.members:
+        if m.name == name:
+            return m
+    for c in ns.callables:
+        if c.name == name:
+            return c
+    return None
+
+
+def resolve_by_scan(ns: Namespace, tokens: List[str]) -> Any:
+    for token in tokens:
+        found = scan(ns, token)
+        if not isinstance(found, Namespace):
+            return found
+        ns = found
+    return None
+
+
+def per_call(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        fn()
+    return (time.perf_counter() - start) / CALLS
+
+
+def main() -> None:
+    print(f"{'tree':>12} {'scan (us)':>12} {'index (us)':>12} {'abbrev. (us)':>13}")
+    for width, depth in TREES:
+        root = type('Root', (make_cli(width, depth),), {'migrate': _command})
+        last = width - 1
+        path = [f'group_{last}'] * (depth - 1) + [f'cmd_{last}']
+        tree = compile(root)
+        abbreviated = compile(root, abbreviations=True)
+        _resolve(abbreviated, ['mig'])  # builds the prefix table of the root level
+
+        scanned = per_call(lambda: resolve_by_scan(tree, path))
+        indexed = per_call(lambda: _resolve(tree, path))
+        expanded = per_call(lambda: _resolve(abbreviated, ['mig']))
+        print(f'{width:>7}x{depth:<4} {scanned * 1e6:>12.2f} {indexed * 1e6:>12.2f} {expanded * 1e6:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
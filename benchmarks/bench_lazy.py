@@ -0,0 +1,36 @@
+"""
+Cold dispatch cost (build the tree, run one command) of eager vs lazy namespaces,
+for trees of growing size.
+
+    python -m benchmarks.bench_lazy
+"""
+import time
+
+from benchmarks.synthetic import deepest_command, make_cli
+from water_cli.parser import Namespace, _parse
+
+WIDTH = 8
+DEPTHS = [1, 2, 3, 4]
+CALLS = 20
+
+
+def per_call(root: type, tokens: list, lazy: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        _parse(Namespace.from_callable(root, lazy=lazy), tokens)
+    return (time.perf_counter() - start) / CALLS
+
+
+def main() -> None:
+    print(f"{'depth':>6} {'commands':>10} {'eager (us)':>12} {'lazy (us)':>12}")
+    for depth in DEPTHS:
+        root = make_cli(WIDTH, depth)
+        tokens = deepest_command(depth) + ['--a', '1']
+        commands = sum(WIDTH ** (d + 1) for d in range(depth))
+        eager = per_call(root, tokens, lazy=False)
+        lazy = per_call(root, tokens, lazy=True)
+        print(f'{depth:>6} {commands:>10} {eager * 1e6:>12.1f} {lazy * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
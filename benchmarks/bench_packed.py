@@ -0,0 +1,46 @@
+"""
+Casting a million comma separated ints (and floats) to `List[...]` vs `Packed[List[...]]`:
+time, and peak memory allocated while casting and holding the result.
+
+    python -m benchmarks.bench_packed
+"""
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+from water_cli.parser import Packed, compile_cast
+
+ELEMENTS = 1_000_000
+ROUNDS = 5
+
+
+def measure(convert: Callable[[str], Any], value: str) -> Tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        convert(value)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+
+    gc.collect()
+    tracemalloc.start()
+    result = convert(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main() -> None:
+    for item, value in [(int, ','.join(str(i * 7919) for i in range(ELEMENTS))),
+                        (float, ','.join(f'{i / 7:.6f}' for i in range(ELEMENTS)))]:
+        plain, plain_peak = measure(compile_cast('n', List[item]), value)  # type: ignore[valid-type]
+        packed, packed_peak = measure(compile_cast('n', Packed[List[item]]), value)  # type: ignore[valid-type]
+
+        print(f'{ELEMENTS} x {item.__name__}, {len(value) / 1e6:.1f} MB of input')
+        print(f'  List:   {plain * 1e3:8.1f} ms  peak {plain_peak / 1e6:7.1f} MB')
+        print(f'  Packed: {packed * 1e3:8.1f} ms  peak {packed_peak / 1e6:7.1f} MB '
+              f'({plain / packed:.1f}x faster, {plain_peak / packed_peak:.1f}x less memory)')
+
+
+if __name__ == '__main__':
+    main()
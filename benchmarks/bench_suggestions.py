@@ -0,0 +1,42 @@
+"""
+Building the suggestion index of a namespace with up to 50k commands, and looking up
+typos in it, vs ranking every name by edit distance.
+
+    python -m benchmarks.bench_suggestions
+"""
+import time
+from typing import List
+
+from water_cli.suggestions import SuggestionIndex, distance
+
+SIZES = [100, 1_000, 50_000]
+TYPOS = ['cmd_1234x', 'cdm_4999', 'cmd_12', 'md_777', 'nothing_like_it']
+CALLS = 20
+
+
+def scan(names: List[str], word: str) -> List[str]:
+    return [name for _, name in sorted((distance(word, name), name) for name in names)[:3]]
+
+
+def main() -> None:
+    print(f"{'names':>8} {'build (ms)':>12} {'lookup (us)':>12} {'scan (us)':>12}")
+    for size in SIZES:
+        names = [f'cmd_{i}' for i in range(size)]
+        start = time.perf_counter()
+        index = SuggestionIndex(names)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            for typo in TYPOS:
+                index.suggest(typo)
+        lookup = (time.perf_counter() - start) / CALLS / len(TYPOS)
+
+        start = time.perf_counter()
+        scan(names, TYPOS[0])
+        scanned = time.perf_counter() - start
+        print(f'{size:>8} {build * 1e3:>12.1f} {lookup * 1e6:>12.1f} {scanned * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Scaling of tokenizing and parsing an argv carrying N repeated `--host` values,
+from 10 to 1M tokens. The quadratic tokenizer water used to have is only timed up
+to 10k tokens.
+
+    python -m benchmarks.bench_tokenize
+"""
+import re
+import time
+from typing import Any, List, Optional, Tuple
+
+from water_cli.exceptions import ConsecutiveValues, UnexpectedValue
+from water_cli.parser import Namespace, Repeated, _parse, args_to_kwargs
+
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+LEGACY_MAX = 10_000
+
+
+def legacy_args_to_kwargs(args: List[str]) -> List[Tuple[str, Any]]:
+    kwargs: List[Tuple[str, Optional[str]]] = []
+    last_key = None
+    last_value = None
+    current_key = None
+    for arg in args:
+        if not arg.startswith('--') and current_key is None:
+            if last_key and last_value:
+                raise ConsecutiveValues(last_key, last_value, arg)
+            raise UnexpectedValue(arg)
+        with_equal = re.match(r'(?P<flag>--[a-z0-9-_]+)=(?P<value>.+)', arg)
+        if with_equal:
+            k = str(with_equal.group('flag'))[2:].replace('-', '_')
+            v = str(with_equal.group('value'))
+            kwargs.append((k, v))
+            last_key = k
+            last_value = v
+        elif arg.startswith('--'):
+            k = arg[2:].replace('-', '_')
+            kwargs.append((k, None))
+            current_key = k
+            last_key = k
+        else:
+            for idx, (_key, _) in reversed(list(enumerate(kwargs))):
+                if _key == current_key:
+                    kwargs[idx] = (_key, arg)
+                    last_key = _key
+                    last_value = arg
+                    current_key = None
+                    break
+    return kwargs
+
+
+def connect(host: Repeated[str], timeout: int = 5) -> None:
+    pass
+
+
+def timed(fn: Any) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    ns = Namespace.from_callable(connect)
+    print(f"{'tokens':>10} {'legacy (ms)':>12} {'tokenize (ms)':>14} {'parse (ms)':>11}")
+    for size in SIZES:
+        argv = []
+        for i in range(size // 2):
+            argv += ['--host', f'h{i}']
+        legacy = f'{timed(lambda: legacy_args_to_kwargs(argv)) * 1e3:12.2f}' if size <= LEGACY_MAX else f"{'-':>12}"
+        tokenize = timed(lambda: args_to_kwargs(argv, repeated=['host']))
+        parse = timed(lambda: _parse(ns, ['connect'] + argv))
+        print(f'{size:>10} {legacy} {tokenize * 1e3:14.2f} {parse * 1e3:11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Casting 100k comma separated values to `List[Union[int, float, str]]` and
+`List[Optional[Color]]`, trying every member of the union until one converts
+vs skipping the members whose syntax check rejects the value.
+
+    python -m benchmarks.bench_union
+"""
+import enum
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from water_cli.parser import compile_cast, typing_get_args
+
+ELEMENTS = 100_000
+ROUNDS = 5
+
+
+class Color(enum.Enum):
+    red = 1
+    green = 2
+
+
+def try_each(annotation: Any) -> Callable[[str], List[Any]]:
+    # what casting unions did before: raise and catch until a member converts
+    options = [compile_cast('v', arg) for arg in typing_get_args(annotation)]
+
+    def _union(value: Any) -> Any:
+        for convert in options:
+            try:
+                return convert(value)
+            except Exception:
+                continue
+        return value
+    return lambda value: list(map(_union, value.split(',')))
+
+
+def per_round(convert: Callable[[str], Any], value: str) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        convert(value)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> None:
+    mixed = ','.join(['17', '2.5', 'host', '-3e2', 'nan', 'x1'][i % 6] for i in range(ELEMENTS))
+    colors = ','.join(['red', 'blue', 'green', ''][i % 4] for i in range(ELEMENTS))
+    for annotation, value in [(Union[int, float, str], mixed), (Optional[Color], colors)]:
+        before = per_round(try_each(annotation), value)
+        after = per_round(compile_cast('v', List[annotation]), value)  # type: ignore[valid-type]
+        print(f'List[{annotation}]')
+        print(f'  try each member: {before * 1e3:8.1f} ms')
+        print(f'  checked:         {after * 1e3:8.1f} ms ({before / after:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Times every phase of dispatching a command, over synthetic CLIs from 1 to 10k commands
+and 1 to 10 levels deep, and argument vectors from 10 to 1M tokens:
+
+    build      `Namespace.from_callable` on the whole tree
+    tokenize   `args_to_kwargs`
+    parse      `_parse`: walking the tree and tokenizing
+    cast       converting the parsed values with the cast plan
+    execute    `execute_command` on an already compiled tree
+
+Record a baseline, then compare a later run against it; `compare` exits with status 1
+if any phase got slower than the baseline by more than `--threshold` (a fraction).
+
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite compare --baseline baseline.json --threshold 0.25
+
+`--quick` skips the largest sizes.
+"""
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from benchmarks.synthetic import deepest_command, make_sized_cli
+from water_cli import Flag, Repeated, simple_cli
+from water_cli.parser import Namespace, _parse, args_to_kwargs, compile, execute_argv
+
+TREES = [(1, 1), (100, 1), (100, 10), (10_000, 1), (10_000, 10)]
+ARGV_SIZES = [10, 10_000, 1_000_000]
+QUICK_MAX = 10_000
+
+# every phase is repeated until it ran for at least this long, and the fastest run is kept
+MIN_TIME = 0.2
+MAX_ROUNDS = 1_000
+
+
+def best_of(fn: Callable[[], Any]) -> float:
+    best = float('inf')
+    total = 0.0
+    for _ in range(MAX_ROUNDS):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total >= MIN_TIME:
+            break
+    return best
+
+
+def connect(host: Repeated[int], timeout: int = 5) -> None:
+    pass
+
+
+def tree_phases(commands: int, depth: int) -> Iterator[Tuple[str, float]]:
+    root = make_sized_cli(commands, depth)
+    argv = deepest_command(depth) + ['--a', '1', '--b', 'x']
+    ns = compile(root)
+    yield 'build', best_of(lambda: Namespace.from_callable(root))
+    yield 'parse', best_of(lambda: _parse(ns, argv))
+    yield 'execute', best_of(lambda: execute_argv(ns, argv))
+
+
+def argv_phases(tokens: int) -> Iterator[Tuple[str, float]]:
+    ns = compile(connect)
+    values = [str(i) for i in range(tokens // 2)]
+    argv = []
+    for value in values:
+        argv += ['--host', value]
+    convert, _ = ns.callables[0].cast_plan()['host']
+    yield 'tokenize', best_of(lambda: args_to_kwargs(argv, repeated=['host']))
+    yield 'parse', best_of(lambda: _parse(ns, ['connect'] + argv))
+    yield 'cast', best_of(lambda: convert(values))
+    yield 'execute', best_of(lambda: execute_argv(ns, ['connect'] + argv))
+
+
+def measure(quick: bool) -> Dict[str, float]:
+    results = {}
+    for commands, depth in TREES:
+        if quick and commands > QUICK_MAX:
+            continue
+        for phase, seconds in tree_phases(commands, depth):
+            results[f'{phase}/commands={commands},depth={depth}'] = seconds
+    for tokens in ARGV_SIZES:
+        if quick and tokens > QUICK_MAX:
+            continue
+        for phase, seconds in argv_phases(tokens):
+            results[f'{phase}/tokens={tokens}'] = seconds
+    return results
+
+
+def regressions(baseline: Dict[str, float], current: Dict[str, float], threshold: float) -> List[str]:
+    """
+    The phases present in both runs which took more than `1 + threshold` times their baseline.
+    """
+    return [name for name in baseline
+            if name in current and current[name] > baseline[name] * (1 + threshold)]
+
+
+def _table(results: Dict[str, float], baseline: Dict[str, float]) -> None:
+    for name, seconds in results.items():
+        line = f'{name:<40} {seconds * 1e6:14.1f} us'
+        if name in baseline:
+            line += f' {seconds / baseline[name]:8.2f}x'
+        print(line)
+
+
+class Suite:
+    def run(self, quick: Flag, output: str = ''):
+        """
+        Time every phase, optionally writing the results to `output`.
+        """
+        results = measure(bool(quick))
+        _table(results, {})
+        if output:
+            with open(output, 'w') as f:
+                json.dump({'python': platform.python_version(), 'results': results}, f, indent=2)
+
+    def compare(self, baseline: str, quick: Flag, threshold: float = 0.25):
+        """
+        Time every phase and compare against the results stored in `baseline`.
+        """
+        with open(baseline) as f:
+            stored = json.load(f)['results']
+        results = measure(bool(quick))
+        _table(results, stored)
+        slower = regressions(stored, results, threshold)
+        if slower:
+            print(f'Slower than the baseline by more than {threshold:.0%}:', ', '.join(slower))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    simple_cli(Suite)
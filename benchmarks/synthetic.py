@@ -0,0 +1,50 @@
+"""
+Synthetic command trees of configurable size, used by the benchmarks.
+"""
+from typing import Any, List
+
+
+def _command(self: Any, a: int, b: str = 'x') -> int:
+    return a
+
+
+def make_cli(width: int, depth: int, name: str = 'Root') -> type:
+    """
+    Build a class with `width` commands per level and `depth` levels of nested groups.
+
+    Every level contains `width` commands named `cmd_<i>` and, except the deepest one,
+    `width` groups named `group_<i>`; every command takes `--a: int` and `--b: str`.
+    """
+    attrs: dict = {f'cmd_{i}': _command for i in range(width)}
+    if depth > 1:
+        for i in range(width):
+            attrs[f'group_{i}'] = make_cli(width, depth - 1, name=f'group_{i}')
+    return type(name, (), attrs)
+
+
+def make_flat_cli(commands: int, name: str = 'Root') -> type:
+    """
+    Build a class with `commands` commands and no nesting.
+    """
+    return type(name, (), {f'cmd_{i}': _command for i in range(commands)})
+
+
+def deepest_command(depth: int) -> List[str]:
+    """
+    Tokens selecting the first command of the deepest level of a `make_cli` tree.
+    """
+    return ['group_0'] * (depth - 1) + ['cmd_0']
+
+
+def make_sized_cli(commands: int, depth: int, name: str = 'Root') -> type:
+    """
+    Build a class with `commands` commands in total, spread evenly over `depth` levels.
+
+    Every level but the deepest contains a single group, `group_0`, holding the next
+    level, so `deepest_command(depth)` selects a command of the deepest level.
+    """
+    per_level = max(1, commands // depth)
+    attrs: dict = {f'cmd_{i}': _command for i in range(per_level)}
+    if depth > 1:
+        attrs['group_0'] = make_sized_cli(commands - per_level, depth - 1, name='group_0')
+    return type(name, (), attrs)
@@ -0,0 +1,74 @@
+import pytest
+
+from water_cli.parser import _unique_prefixes, compile, execute_command
+from water_cli.exceptions import BadSubcommand
+from water_cli.snapshot import SnapshotNamespace, load_or_build
+
+
+class Tool:
+    class db:
+        def migrate(self, to: int = 0):
+            return f'migrate {to}'
+
+        def migrations(self):
+            return 'migrations'
+
+        def dump(self):
+            return 'dump'
+
+    class deploy:
+        def run(self):
+            return 'deploy'
+
+    def status(self):
+        return 'status'
+
+    def stat(self):
+        return 'stat'
+
+
+def test_unique_prefixes():
+    assert _unique_prefixes(['migrate', 'migrations', 'dump']) == {
+        'd': 'dump', 'du': 'dump', 'dum': 'dump',
+        'migrati': 'migrations', 'migratio': 'migrations', 'migration': 'migrations',
+    }
+    assert _unique_prefixes(['a', 'a']) == {}
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_abbreviations(lazy):
+    ns = compile(Tool, lazy=lazy, abbreviations=True)
+    assert execute_command(ns, 'db du') == 'dump'
+    assert execute_command(ns, 'db migrate --to 3') == 'migrate 3'
+    assert execute_command(ns, 'db migrati') == 'migrations'
+    assert execute_command(ns, 'dep r') == 'deploy'
+    assert execute_command(ns, 'statu') == 'status'
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_exact_match_wins(lazy):
+    ns = compile(Tool, lazy=lazy, abbreviations=True)
+    assert execute_command(ns, 'stat') == 'stat'
+
+
+@pytest.mark.parametrize('command', ['d du', 'db mig', 'sta', 'db nope'])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_ambiguous_or_unknown(lazy, command):
+    ns = compile(Tool, lazy=lazy, abbreviations=True)
+    with pytest.raises(BadSubcommand):
+        execute_command(ns, command)
+
+
+def test_abbreviations_are_opt_in():
+    with pytest.raises(BadSubcommand):
+        execute_command(Tool, 'db du')
+
+
+def test_abbreviations_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    load_or_build(Tool)
+    ns = load_or_build(Tool, abbreviations=True)
+    assert isinstance(ns, SnapshotNamespace)
+    assert execute_command(ns, 'dep r') == 'deploy'
+    with pytest.raises(BadSubcommand):
+        execute_command(ns, 'db mig')
@@ -1,9 +1,13 @@
 import enum
+import random
 import typing
 
 import pytest
 
-from water_cli.parser import Repeated, cast
+import array
+
+from water_cli.parser import MCallable, MappedFile, Packed, Repeated, _may_accept, cast, compile_cast, execute_command
+from water_cli.exceptions import IncorrectType, InvalidChoice
 
 class SomeEnum(enum.Enum):
     SOMETHING = enum.auto()
@@ -51,3 +55,172 @@ class SomeEnum(enum.Enum):
     ])
 def test_cast(_type, in_str, expected):
     assert cast("key", in_str, _type) == expected
+
+
+def test_cast_plan_is_compiled_once():
+    def fn(a: int, b: typing.List[SomeEnum]):
+        pass
+    c = MCallable.from_callable(fn, 'fn', parent=None)
+    plan = c.cast_plan()
+    assert plan is c.cast_plan()
+    assert plan['a'][0]('3') == 3
+    assert plan['a'][1] == 'int'
+    assert plan['b'][0]('OTHER,SOMETHING') == [SomeEnum.OTHER, SomeEnum.SOMETHING]
+
+
+def test_invalid_choice_from_compiled_cast():
+    with pytest.raises(InvalidChoice) as e:
+        compile_cast('key', SomeEnum)('NOPE')
+    assert e.value.argument == 'key'
+    assert e.value.valid_options == ['SOMETHING', 'OTHER']
+
+
+def test_unsupported_annotation_fails_on_conversion():
+    convert = compile_cast('key', 'int')
+    with pytest.raises(TypeError):
+        convert('1')
+
+
+def test_union_falls_back_to_raw_value():
+    assert cast('key', 'abc', typing.Union[int, float]) == 'abc'
+
+
+def test_mapped_file(tmp_path):
+    path = tmp_path / 'blob.bin'
+    path.write_bytes(b'\x00\x01binary\xff')
+    view = cast('key', str(path), MappedFile)
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert view[2:8] == b'binary'
+    assert bytes(view) == b'\x00\x01binary\xff'
+
+
+def test_mapped_file_empty(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    view = cast('key', str(path), MappedFile)
+    assert isinstance(view, memoryview)
+    assert len(view) == 0
+
+
+def test_mapped_file_missing(tmp_path):
+    def size(blob: MappedFile):
+        return len(blob)
+    with pytest.raises(IncorrectType) as e:
+        execute_command(size, f'size --blob {tmp_path / "missing"}')
+    assert e.value.expected_type == 'MappedFile'
+    assert isinstance(e.value.conversion_error, FileNotFoundError)
+
+
+@pytest.mark.parametrize("annotation, value, typecode, expected", [
+    (Packed[typing.List[int]], "1,-2,3", "q", [1, -2, 3]),
+    (Packed[typing.List[float]], "1.5,2", "d", [1.5, 2.0]),
+    (Packed[Repeated[int]], ["4", "5"], "q", [4, 5]),
+    (Packed[Repeated[float]], ["0.25"], "d", [0.25]),
+])
+def test_packed(annotation, value, typecode, expected):
+    res = cast("key", value, annotation)
+    assert isinstance(res, array.array)
+    assert res.typecode == typecode
+    assert res.tolist() == expected
+
+
+def test_packed_many_chunks():
+    numbers = list(range(200_000))
+    res = cast("key", ",".join(map(str, numbers)), Packed[typing.List[int]])
+    assert res.tolist() == numbers
+
+
+@pytest.mark.parametrize("item", [int, float])
+@pytest.mark.parametrize("value", ["+1,2", " 3 , 4", "1_000", "-0,00", "1.5,2", "1e3", "nan,inf,-Infinity", "true", "null",
+                                   "[1],[2]", "\"1\"", "\u0661"])
+def test_packed_matches_list(item, value):
+    try:
+        expected = cast("key", value, typing.List[item])
+    except ValueError:
+        with pytest.raises(ValueError):
+            cast("key", value, Packed[typing.List[item]])
+        return
+    assert cast("key", value, Packed[typing.List[item]]).tolist() == pytest.approx(expected, nan_ok=True)
+
+
+@pytest.mark.parametrize("value", ["1,,2", "1,2,", "", "1,x", "true", "1.5", str(2 ** 64)])
+def test_packed_invalid(value):
+    with pytest.raises((ValueError, OverflowError)):
+        cast("key", value, Packed[typing.List[int]])
+
+
+def test_packed_unsupported():
+    with pytest.raises(TypeError):
+        cast("key", "a,b", Packed[typing.List[str]])
+
+
+def test_packed_repeated_is_grouped():
+    def total(n: Packed[Repeated[int]]):
+        return n
+    assert execute_command(total, "total --n 1 --n 2").tolist() == [1, 2]
+
+
+def test_packed_error_names_wrapped_type():
+    def packed(n: Packed[typing.List[int]]):
+        return n
+
+    def plain(n: typing.List[int]):
+        return n
+    errors = []
+    for f in [packed, plain]:
+        with pytest.raises(IncorrectType) as e:
+            execute_command(f, f"{f.__name__} --n 1,x")
+        errors.append(e.value.expected_type)
+    assert errors[0] == errors[1] != 'Packed'
+
+
+_FUZZ_ALPHABET = list('0123456789+-._eEinfatyx ') + ['\t', '\n', '\x0b', '\x1c', '\x85', '\xa0', '٣',
+                                                    'inf', 'nan', 'Infinity']
+
+def _fuzz_values(seed, count=20_000):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(_FUZZ_ALPHABET) for _ in range(rng.randint(0, 8))) for _ in range(count)]
+
+
+def _converts(convert, value):
+    try:
+        convert(value)
+    except ValueError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('_type', [int, float])
+def test_union_checks_never_reject_valid_numbers(_type):
+    may_accept = _may_accept(_type)
+    for value in _fuzz_values(seed=_type.__name__):
+        if _converts(_type, value):
+            assert may_accept(value), repr(value)
+        elif value.isascii():
+            assert not may_accept(value), repr(value)
+
+
+@pytest.mark.parametrize('annotation', [
+    typing.Union[int, float, str],
+    typing.Union[float, int],
+    typing.Union[bool, int],
+    typing.Optional[int],
+    typing.Union[SomeEnum, int, None],
+    typing.Union[typing.List[int], float],
+])
+def test_union_precedence(annotation):
+    members = [compile_cast('key', arg) for arg in typing.get_args(annotation)]
+
+    def try_each(value):
+        for convert in members:
+            try:
+                return convert(value)
+            except Exception:
+                continue
+        return value
+
+    union = compile_cast('key', annotation)
+    for value in _fuzz_values(seed=1, count=2_000) + ['SOMETHING', 'OTHER', '1,2', '9' * 5000]:
+        expected, got = try_each(value), union(value)
+        assert type(got) is type(expected) and (got == expected or got != got), repr(value)
@@ -1,4 +1,7 @@
+import pytest
+
 from water_cli.parser import args_to_kwargs
+from water_cli.exceptions import BadArguments, UnexpectedValue
 
 
 def test_args_to_kwargs():
@@ -29,3 +32,63 @@ def test_args_with_dash_become_underscore():
 def test_args_repeated_with_flag():
     res = args_to_kwargs(['--arg2', '20', '--arg2', '30'])
     assert res == [('arg2', '20'), ('arg2', '30')]
+
+
+def test_args_value_containing_equal():
+    res = args_to_kwargs(['--arg2=a=b'])
+    assert res == [('arg2', 'a=b')]
+
+
+def test_args_repeated_grouped():
+    res = args_to_kwargs(['--host', 'a', '--port', '1', '--host=b', '--host', 'c'], repeated=['host'])
+    assert res == [('port', '1'), ('host', ['a', 'b', 'c'])]
+
+
+def test_args_repeated_grouped_in_order_of_repeated():
+    res = args_to_kwargs(['--b', '1', '--a', '2', '--c', '3'], repeated=['a', 'b'])
+    assert res == [('c', '3'), ('a', ['2']), ('b', ['1'])]
+
+
+def test_args_repeated_absent():
+    res = args_to_kwargs(['--port', '1'], repeated=['host'])
+    assert res == [('port', '1')]
+
+
+def test_args_repeated_without_value():
+    res = args_to_kwargs(['--host', '--port', '1'], repeated=['host'])
+    assert res == [('port', '1'), ('host', [None])]
+
+
+def test_args_large_input():
+    res = args_to_kwargs(['--host', 'h'] * 100_000 + ['--port', '1'], repeated=['host'])
+    assert res == [('port', '1'), ('host', ['h'] * 100_000)]
+
+
+def test_args_response_file(tmp_path):
+    path = tmp_path / 'args'
+    path.write_text('--host\na b\n\n--port=1\n')
+    res = args_to_kwargs(['--verbose', '--name', 'x', f'@{path}', '--host', 'c'], repeated=['host'])
+    assert res == [('verbose', None), ('name', 'x'), ('port', '1'), ('host', ['a b', 'c'])]
+
+
+def test_args_response_file_nested(tmp_path):
+    inner = tmp_path / 'inner'
+    inner.write_text('--b\n2\n')
+    outer = tmp_path / 'outer'
+    outer.write_text(f'--a\n1\n@{inner}\n--c\n3\n')
+    assert args_to_kwargs([f'@{outer}']) == [('a', '1'), ('b', '2'), ('c', '3')]
+
+
+def test_args_response_file_only_in_key_position(tmp_path):
+    assert args_to_kwargs(['--numbers', '@nope']) == [('numbers', '@nope')]
+    with pytest.raises(UnexpectedValue):
+        args_to_kwargs(['@'])
+
+
+def test_args_response_file_errors(tmp_path):
+    with pytest.raises(BadArguments):
+        args_to_kwargs([f'@{tmp_path / "missing"}'])
+    looping = tmp_path / 'looping'
+    looping.write_text(f'@{looping}\n')
+    with pytest.raises(BadArguments):
+        args_to_kwargs([f'@{looping}'])
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from water_cli.parser import execute_command, args_to_kwargs
@@ -89,3 +91,16 @@ def test_bad_argument_conversion():
     assert e.value.provided_value == 'a string'
     assert str(e.value.conversion_error) == "could not convert string to float: 'a string'"
     assert str(e.value) == "Unable to convert 'a string' to type 'float': could not convert string to float: 'a string'"
+
+
+@pytest.mark.parametrize('error', [
+    BadArguments('Received no arguments'),
+    BadSubcommand(['Math1'], 'nope', ['add']),
+    IncorrectType('int', 'a', ValueError('bad')),
+    MissingParameters(['a', 'b']),
+])
+def test_errors_can_be_pickled(error):
+    restored = pickle.loads(pickle.dumps(error))
+    assert type(restored) is type(error)
+    assert str(restored) == str(error)
+    assert vars(restored).keys() == vars(error).keys()
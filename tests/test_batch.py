@@ -0,0 +1,241 @@
+import asyncio
+import io
+import os
+import sys
+import time
+
+from unittest.mock import patch
+
+import pytest
+
+from examples import calculator
+from water_cli import Stream, compile, simple_cli
+from water_cli.batch import BatchResult, execute_batch
+from water_cli.exceptions import IncorrectType, MissingParameters, BadSubcommand, BadArguments
+
+constructed = []
+
+
+class Counter:
+    def __init__(self):
+        constructed.append(self)
+        self.total = 0
+
+    def add(self, n: int):
+        self.total += n
+        return self.total
+
+
+def test_execute_batch():
+    lines = ['double --number 1', '', '# a comment', 'double --number 2\n']
+    results = list(execute_batch(calculator.Calculator, lines))
+    assert results == [BatchResult(1, 'double --number 1', result=2),
+                       BatchResult(4, 'double --number 2', result=4)]
+
+
+def test_execute_batch_reports_errors_per_line():
+    lines = ['double --number a', 'triple --number 1', 'double', 'double --number "1', 'double --number 3']
+    results = list(execute_batch(calculator.Calculator, lines))
+    assert isinstance(results[0].error, IncorrectType)
+    assert isinstance(results[1].error, BadSubcommand)
+    assert isinstance(results[2].error, MissingParameters)
+    assert type(results[3].error) is BadArguments
+    assert 'Unable to split' in str(results[3].error)
+    assert results[4].result == 6
+    assert results[4].error is None
+
+
+def test_execute_batch_is_lazy():
+    consumed = []
+
+    def lines():
+        for i in range(3):
+            consumed.append(i)
+            yield f'double --number {i}'
+
+    results = execute_batch(calculator.Calculator, lines())
+    assert next(results).result == 0
+    assert consumed == [0]
+
+
+def test_execute_batch_reuses_instances():
+    constructed.clear()
+    results = list(execute_batch(Counter, ['add --n 1', 'add --n 2']))
+    assert [r.result for r in results] == [1, 3]
+    assert len(constructed) == 1
+
+
+def test_simple_cli_batch_file(capsys, tmp_path):
+    commands = tmp_path / 'commands'
+    commands.write_text('double --number 1\ndouble --number x\nnope\n')
+    with patch("sys.argv", [sys.argv[0], "--batch", str(commands)]):
+        simple_cli(calculator.Calculator)
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "2",
+        "line 2: Unable to convert 'x' to type 'int': invalid literal for int() with base 10: 'x'",
+        "line 3: No top-level command 'nope'. Try any of: ['double']",
+    ]
+
+
+def test_simple_cli_batch_stdin(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch", "-"]), patch("sys.stdin", io.StringIO('double --number 5\n')):
+        simple_cli(calculator.Calculator)
+    captured = capsys.readouterr()
+    assert captured.out.strip() == "10"
+
+
+class Lines:
+    def hi(self):
+        return 'hi'
+
+    def count(self, lines: Stream[str]):
+        return sum(1 for _ in lines)
+
+
+def test_simple_cli_batch_stdin_streams_are_empty(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch", "-"]), patch("sys.stdin", io.StringIO('hi\ncount\nhi\nhi\n')):
+        simple_cli(Lines)
+    assert capsys.readouterr().out.splitlines() == ['hi', '0', 'hi', 'hi']
+
+
+def test_simple_cli_batch_usage(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch"]):
+        simple_cli(calculator.Calculator)
+    captured = capsys.readouterr()
+    assert captured.out.startswith("--batch takes a file")
+
+
+def test_simple_cli_batch_missing_file(capsys, tmp_path):
+    missing = tmp_path / 'missing.txt'
+    with patch("sys.argv", [sys.argv[0], "--batch", str(missing)]):
+        simple_cli(calculator.Calculator)
+    assert capsys.readouterr().out.strip() == (
+        f"--batch takes a file with one command per line, or - for stdin: No such file or directory: {missing}")
+
+
+class Async:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def sleep(self, seconds: float, value: int):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(seconds)
+        self.running -= 1
+        return value
+
+    async def fail(self):
+        raise MissingParameters(['x'])
+
+    def peak_concurrency(self):
+        return self.peak
+
+
+def test_execute_batch_runs_coroutines():
+    results = list(execute_batch(Async, ['sleep --seconds 0 --value 1', 'fail']))
+    assert results[0].result == 1
+    assert isinstance(results[1].error, MissingParameters)
+
+
+def test_execute_batch_concurrency():
+    # later lines finish first, results still come back in input order
+    lines = [f'sleep --seconds {0.05 - i * 0.01} --value {i}' for i in range(5)] + ['fail', 'peak_concurrency']
+    results = list(execute_batch(Async, lines, concurrency=3))
+    assert [r.result for r in results[:5]] == [0, 1, 2, 3, 4]
+    assert isinstance(results[5].error, MissingParameters)
+    assert results[6].result == 3
+
+
+def test_execute_batch_concurrency_is_faster():
+    lines = ['sleep --seconds 0.05 --value 1'] * 10
+    start = time.perf_counter()
+    assert [r.result for r in execute_batch(Async, lines, concurrency=10)] == [1] * 10
+    assert time.perf_counter() - start < 0.4
+
+
+def test_execute_batch_concurrency_early_exit():
+    start = time.perf_counter()
+    results = execute_batch(Async, ['sleep --seconds 0 --value 1'] + ['sleep --seconds 10 --value 2'] * 3,
+                            concurrency=4)
+    assert next(results).result == 1
+    results.close()  # cancels the commands still in flight
+    assert time.perf_counter() - start < 1
+
+
+def test_simple_cli_batch_concurrency(capsys):
+    stdin = io.StringIO('sleep --seconds 0 --value 1\nsleep --seconds 0 --value 2\n')
+    with patch("sys.argv", [sys.argv[0], "--batch", "-", "--concurrency", "2"]), patch("sys.stdin", stdin):
+        simple_cli(Async)
+    assert capsys.readouterr().out.splitlines() == ['1', '2']
+
+
+def test_simple_cli_batch_bad_options(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch", "-", "--threads", "2"]):
+        simple_cli(Async)
+    assert capsys.readouterr().out.strip() == "Invalid --batch options: Unexpected parameters: --threads"
+
+
+class Work:
+    def pid(self):
+        return os.getpid()
+
+    def square(self, n: int):
+        return n * n
+
+
+@pytest.mark.parametrize('executor,chunksize', [('thread', 1), ('process', 1), ('process', 7)])
+def test_execute_batch_executor(executor, chunksize):
+    lines = [f'square --n {i}' for i in range(50)] + ['square --n x', 'nope']
+    results = list(execute_batch(Work, lines, executor=executor, workers=3, chunksize=chunksize))
+    assert [r.result for r in results[:50]] == [i * i for i in range(50)]
+    assert [r.line_number for r in results] == list(range(1, 53))
+    assert isinstance(results[50].error, IncorrectType)
+    assert str(results[50].error) == "Unable to convert 'x' to type 'int': invalid literal for int() with base 10: 'x'"
+    assert isinstance(results[51].error, BadSubcommand)
+    assert results[51].error.valid_options == ['pid', 'square']
+
+
+def test_execute_batch_process_executor_runs_in_workers():
+    results = list(execute_batch(Work, ['pid'] * 10, executor='process', workers=2))
+    pids = {r.result for r in results}
+    assert os.getpid() not in pids
+    assert 1 <= len(pids) <= 2
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'executor': 'fibers'},
+    {'executor': 'thread', 'concurrency': 2},
+    {'chunksize': 0},
+    {'executor': 'thread', 'workers': 0},
+    {'executor': 'process', 'workers': -1},
+])
+def test_execute_batch_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        execute_batch(Work, [], **kwargs)
+
+
+def test_execute_batch_process_executor_needs_root():
+    with pytest.raises(ValueError):
+        execute_batch(compile(Work), [], executor='process')
+
+
+def test_simple_cli_batch_executor(capsys):
+    stdin = io.StringIO('square --n 2\nsquare --n 3\n')
+    with patch("sys.argv", [sys.argv[0], "--batch", "-", "--executor", "thread", "--workers", "2"]), \
+            patch("sys.stdin", stdin):
+        simple_cli(Work)
+    assert capsys.readouterr().out.splitlines() == ['4', '9']
+
+
+def test_simple_cli_batch_invalid_workers(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch", "-", "--executor", "thread", "--workers", "0"]):
+        simple_cli(Work)
+    assert capsys.readouterr().out.strip() == "Invalid --batch options: 'workers' must be at least 1"
+
+
+def test_simple_cli_batch_invalid_executor(capsys):
+    with patch("sys.argv", [sys.argv[0], "--batch", "-", "--executor", "fibers"]):
+        simple_cli(Work)
+    assert capsys.readouterr().out.startswith("Invalid --batch options: Unknown executor 'fibers'")
@@ -0,0 +1,21 @@
+from benchmarks.suite import regressions
+from benchmarks.synthetic import deepest_command, make_sized_cli
+from water_cli.parser import Namespace, execute_command
+
+
+def test_regressions():
+    baseline = {'build/a': 1.0, 'parse/a': 1.0, 'gone/a': 1.0}
+    current = {'build/a': 1.2, 'parse/a': 1.3, 'new/a': 9.0}
+    assert regressions(baseline, current, 0.25) == ['parse/a']
+    assert regressions(baseline, current, 0.1) == ['build/a', 'parse/a']
+
+
+def test_make_sized_cli():
+    root = make_sized_cli(100, 10)
+    ns = Namespace.from_callable(root)
+    commands = 0
+    while ns is not None:
+        commands += len(ns.callables)
+        ns = ns.members[0] if ns.members else None
+    assert commands == 100
+    assert execute_command(root, ' '.join(deepest_command(10) + ['--a', '3'])) == 3
@@ -0,0 +1,195 @@
+import asyncio
+import sys
+
+from typing import Iterator
+from unittest.mock import patch
+
+import pytest
+
+from water_cli import Flag, Stream, cached, exclusive_flags, execute_batch, simple_cli
+from water_cli.cache import clear, disabled
+from water_cli.exceptions import ExclusiveFlags
+from water_cli.parser import execute_command
+from water_cli.snapshot import SnapshotNamespace, load_or_build
+
+calls = []
+
+
+class Inventory:
+    @cached(ttl=60, max_entries=2)
+    def lookup(self, host: str, port: int = 22):
+        calls.append((host, port))
+        return {'host': host, 'port': port}
+
+    @cached()
+    async def fetch(self, host: str):
+        calls.append(host)
+        return host.upper()
+
+    @cached()
+    def count(self, lines: Stream[str]):
+        calls.append('count')
+        return sum(1 for _ in lines)
+
+    @cached()
+    def hosts(self, n: int) -> Iterator[str]:
+        calls.append(n)
+        return (f'host-{i}' for i in range(n))
+
+    @cached()
+    def fail(self, n: int):
+        calls.append(n)
+        raise RuntimeError(n)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    calls.clear()
+
+
+def test_cached_result():
+    assert execute_command(Inventory, 'lookup --host a') == {'host': 'a', 'port': 22}
+    assert execute_command(Inventory, 'lookup --host a') == {'host': 'a', 'port': 22}
+    assert calls == [('a', 22)]
+
+
+def test_key_is_cast_and_ordered():
+    execute_command(Inventory, 'lookup --host a --port 80')
+    execute_command(Inventory, 'lookup --port 080 --host a')
+    execute_command(Inventory, 'lookup --host a --port 81')
+    assert calls == [('a', 80), ('a', 81)]
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('water_cli.cache.time.time', lambda: now[0])
+    execute_command(Inventory, 'lookup --host a')
+    now[0] += 59
+    execute_command(Inventory, 'lookup --host a')
+    now[0] += 2
+    execute_command(Inventory, 'lookup --host a')
+    assert calls == [('a', 22), ('a', 22)]
+
+
+def test_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('water_cli.cache.time.time', lambda: now[0])
+    for host in ['a', 'b', 'a', 'c', 'a', 'b']:
+        now[0] += 1
+        execute_command(Inventory, f'lookup --host {host}')
+    # 'b' was evicted by 'c', as 'a' had been used more recently
+    assert calls == [('a', 22), ('b', 22), ('c', 22), ('b', 22)]
+
+
+def test_async_command():
+    assert execute_command(Inventory, 'fetch --host a') == 'A'
+    assert execute_command(Inventory, 'fetch --host a') == 'A'
+    assert calls == ['a']
+
+
+def test_async_command_in_running_loop():
+    async def main():
+        return [await execute_command(Inventory, 'fetch --host a') for _ in range(2)]
+    assert asyncio.run(main()) == ['A', 'A']
+    assert calls == ['a']
+
+
+def test_unpicklable_arguments_are_not_cached(tmp_path):
+    path = tmp_path / 'lines.txt'
+    path.write_text('x\ny\n')
+    assert execute_command(Inventory, f'count --lines @{path}') == 2
+    assert execute_command(Inventory, f'count --lines @{path}') == 2
+    assert calls == ['count', 'count']
+
+
+def test_unpicklable_results_are_not_cached():
+    assert list(execute_command(Inventory, 'hosts --n 2')) == ['host-0', 'host-1']
+    assert list(execute_command(Inventory, 'hosts --n 2')) == ['host-0', 'host-1']
+    assert calls == [2, 2]
+
+
+def test_errors_are_not_cached():
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            execute_command(Inventory, 'fail --n 1')
+    assert calls == [1, 1]
+
+
+def test_disabled_and_clear():
+    execute_command(Inventory, 'lookup --host a')
+    with disabled():
+        execute_command(Inventory, 'lookup --host a')
+    execute_command(Inventory, 'lookup --host a')
+    clear()
+    execute_command(Inventory, 'lookup --host a')
+    assert calls == [('a', 22)] * 3
+
+
+def test_direct_calls_are_not_cached():
+    Inventory().lookup('a')
+    Inventory().lookup('a')
+    assert calls == [('a', 22)] * 2
+
+
+def test_unusable_cache_runs_the_command(monkeypatch, tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    monkeypatch.setenv('WATER_CACHE_DIR', str(blocker))
+    execute_command(Inventory, 'lookup --host a')
+    execute_command(Inventory, 'lookup --host a')
+    assert calls == [('a', 22)] * 2
+
+
+def test_simple_cli_no_cache(capsys):
+    for argv in [['lookup', '--host', 'a'], ['--no-cache', 'lookup', '--host', 'a'], ['lookup', '--host', 'a']]:
+        with patch('sys.argv', [sys.argv[0]] + argv):
+            simple_cli(Inventory)
+    assert capsys.readouterr().out.splitlines() == ["{'host': 'a', 'port': 22}"] * 3
+    assert calls == [('a', 22)] * 2
+
+
+def test_invalid_max_entries():
+    with pytest.raises(ValueError):
+        cached(max_entries=0)
+
+
+class Guarded:
+    @cached()
+    @exclusive_flags([('json', 'csv')])
+    def above(self, host: str, json: Flag = False, csv: Flag = False):
+        calls.append(('above', host))
+        return host
+
+    @exclusive_flags([('json', 'csv')])
+    @cached()
+    def below(self, host: str, json: Flag = False, csv: Flag = False):
+        calls.append(('below', host))
+        return host
+
+
+@pytest.mark.parametrize('name', ['above', 'below'])
+def test_cached_with_constraints(name):
+    assert execute_command(Guarded, f'{name} --host a --json') == 'a'
+    assert execute_command(Guarded, f'{name} --host a --json') == 'a'
+    assert calls == [(name, 'a')]
+    with pytest.raises(ExclusiveFlags):
+        execute_command(Guarded, f'{name} --host a --json --csv')
+
+
+def test_cached_snapshot(tmp_path):
+    load_or_build(Guarded)
+    ns = load_or_build(Guarded)
+    assert isinstance(ns, SnapshotNamespace)
+    execute_command(ns, 'above --host a')
+    execute_command(ns, 'above --host a')
+    assert calls == [('above', 'a')]
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_cached_in_batches(concurrency):
+    lines = ['fetch --host a', 'fetch --host b', 'lookup --host c']
+    for _ in range(2):
+        results = list(execute_batch(Inventory, lines, concurrency=concurrency))
+        assert [r.result for r in results] == ['A', 'B', {'host': 'c', 'port': 22}]
+    assert sorted(calls, key=str) == [('c', 22), 'a', 'b']
@@ -0,0 +1,60 @@
+from water_cli.parser import Namespace, compile, invalidate, execute_command
+
+
+class Math:
+    class Nested:
+        def sub(self, a: int, b: int):
+            return a - b
+
+    def add(self, a: int, b: int):
+        return a + b
+
+
+def test_compile_returns_namespace():
+    ns = compile(Math)
+    assert isinstance(ns, Namespace)
+    assert ns.name == 'Math'
+    assert [c.name for c in ns.callables] == ['add']
+    assert [m.name for m in ns.members] == ['Nested']
+
+
+def test_compile_is_cached():
+    assert compile(Math) is compile(Math)
+
+
+def test_invalidate_single():
+    first = compile(Math)
+    invalidate(Math)
+    second = compile(Math)
+    assert first is not second
+    assert second is compile(Math)
+
+
+def test_invalidate_all():
+    first = compile(Math)
+    invalidate()
+    assert compile(Math) is not first
+
+
+def test_invalidate_unknown_is_noop():
+    ns = compile(Math)
+    invalidate(Namespace)
+    assert compile(Math) is ns
+
+
+def test_execute_compiled_tree():
+    ns = compile(Math)
+    assert execute_command(ns, 'add --a 1 --b 2') == 3
+    assert execute_command(ns, 'Nested sub --a 1 --b 2') == -1
+
+
+def test_compiled_trees_are_bounded(monkeypatch):
+    from water_cli import parser
+    monkeypatch.setattr(parser, '_MAX_COMPILED', 4)
+    invalidate()
+    ns = compile(Math)
+    for _ in range(20):
+        assert execute_command({'math': Math}, 'math add --a 1 --b 2') == 3
+        assert execute_command(Math(), 'add --a 1 --b 2') == 3
+        assert compile(Math) is ns  # recently used trees stay
+    assert len(parser._compiled) == 4
@@ -0,0 +1,132 @@
+import enum
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from unittest.mock import patch
+
+from water_cli import simple_cli
+from water_cli.completion import build_index, index_path, script
+from water_cli.parser import Flag, Namespace, Repeated
+
+
+class Color(enum.Enum):
+    red = 1
+    blue = 2
+
+
+class Tool:
+    class Remote:
+        def add(self, name: str):
+            pass
+
+    def paint(self, color: Color, force: Flag, also: Repeated[Color] = None):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+
+def test_build_index():
+    lines = build_index(Namespace.from_callable(Tool))
+    files = [line for line in lines if line.startswith('#file\t')]
+    assert lines[:len(files)] == files
+    assert any(line.endswith('test_completion.py') for line in files)
+    assert lines[len(files):] == [
+        '\tpaint',
+        '\tRemote',
+        'Remote\tadd',
+        'Remote add\t--name',
+        'paint\t--color',
+        'paint --color\tred',
+        'paint --color\tblue',
+        'paint\t--force',
+        'paint\t--also',
+        'paint --also\tred',
+        'paint --also\tblue',
+    ]
+
+
+def test_unknown_shell():
+    with pytest.raises(ValueError):
+        script('tcsh', 'tool', '/tmp/index')
+
+
+@pytest.mark.parametrize('shell', ['bash', 'zsh', 'fish'])
+def test_simple_cli_completion(shell, capsys):
+    with patch('sys.argv', ['/usr/bin/tool', '--completion', shell]):
+        simple_cli(Tool)
+    out = capsys.readouterr().out
+    assert 'tool' in out
+    assert index_path('/usr/bin/tool') in out
+    assert os.path.exists(index_path('/usr/bin/tool'))
+
+
+def test_simple_cli_completion_bad_shell(capsys):
+    with patch('sys.argv', ['/usr/bin/tool', '--completion']):
+        simple_cli(Tool)
+    assert capsys.readouterr().out.startswith('--completion takes the name of a shell')
+
+
+PROGRAM = '''\
+#!{python}
+import sys
+sys.path.insert(0, {root!r})
+import enum
+from water_cli import simple_cli
+
+class Color(enum.Enum):
+    red = 1
+    green = 2
+
+class Tool:
+    def paint(self, color: Color, size: int = 1):
+        pass
+{extra}
+simple_cli(Tool)
+'''
+
+
+def _write_program(path, extra=''):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path.write_text(PROGRAM.format(python=sys.executable, root=root, extra=extra))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+
+
+def _complete(program, completion, words):
+    words = [str(program)] + words
+    run = textwrap.dedent(f'''
+        {completion}
+        COMP_WORDS=({' '.join(repr(w) for w in words)})
+        COMP_CWORD={len(words) - 1}
+        _water_complete_tool
+        echo "${{COMPREPLY[@]}}"
+    ''')
+    return subprocess.run(['bash', '-c', run], capture_output=True, text=True, env=os.environ).stdout.split()
+
+
+@pytest.mark.skipif(shutil.which('bash') is None, reason='needs bash')
+def test_bash_completion(cache):
+    program = cache / 'tool'
+    _write_program(program)
+    completion = subprocess.run([str(program), '--completion', 'bash'], capture_output=True, text=True,
+                                check=True).stdout
+
+    assert _complete(program, completion, ['']) == ['paint']
+    assert _complete(program, completion, ['paint', '--']) == ['--color', '--size']
+    assert _complete(program, completion, ['paint', '--color', '']) == ['red', 'green']
+    assert _complete(program, completion, ['paint', '--color', 'g']) == ['green']
+
+    # the index is rebuilt once the program is modified
+    _write_program(program, extra='    def wash(self):\n        pass\n')
+    index = index_path(str(program))
+    os.utime(index, (0, 0))
+    assert _complete(program, completion, ['']) == ['paint', 'wash']
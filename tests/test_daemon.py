@@ -0,0 +1,167 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from examples import calculator
+from water_cli import Stream
+from water_cli.client import call, main
+from water_cli.daemon import make_server
+
+
+class Tool:
+    def echo_cwd(self):
+        return os.getcwd()
+
+    def fail(self):
+        raise RuntimeError('boom')
+
+    def leave(self, code: int):
+        sys.exit(code)
+
+    def shout(self, text: str):
+        print(text.upper(), file=sys.stderr)
+
+    def count(self, lines: Stream[str]):
+        return sum(1 for _ in lines)
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / 'sock')
+    with make_server({'calc': calculator.Calculator, 'tool': Tool}, path) as srv:
+        t = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.01})
+        t.start()
+        yield path
+        srv.shutdown()
+        t.join()
+    assert not os.path.exists(path)
+
+
+def test_call(server):
+    assert call(server, ['calc', 'double', '--number', '2']) == ('4\n', '', 0)
+
+
+def test_call_bad_arguments(server):
+    assert call(server, ['calc', 'nope']) == ("'calc' has no sub-command 'nope'. Try any of: ['double']\n", '', 0)
+
+
+def test_call_exception(server):
+    stdout, stderr, code = call(server, ['tool', 'fail'])
+    assert stdout == ''
+    assert 'RuntimeError: boom' in stderr
+    assert code == 1
+
+
+def test_call_exit_code(server):
+    assert call(server, ['tool', 'leave', '--code', '3']) == ('', '', 3)
+
+
+def test_call_stderr(server):
+    assert call(server, ['tool', 'shout', '--text', 'hi']) == ('', 'HI\n', 0)
+
+
+def test_call_cwd(server, tmp_path):
+    stdout, _, _ = call(server, ['tool', 'echo_cwd'], cwd=str(tmp_path))
+    assert stdout.strip() == str(tmp_path)
+    assert os.getcwd() != str(tmp_path)
+
+
+def test_client_main(server, capsys):
+    with pytest.raises(SystemExit) as e:
+        main([server, 'calc', 'double', '--number', '21'])
+    assert e.value.code == 0
+    assert capsys.readouterr().out == '42\n'
+
+
+def test_client_subprocess(server):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    s = subprocess.run([sys.executable, '-m', 'water_cli.client', server, 'tool', 'leave', '--code', '4'],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    assert s.returncode == 4
+
+
+def test_refuses_live_socket(server):
+    with pytest.raises(OSError):
+        make_server(Tool, server)
+
+
+def test_replaces_stale_socket(tmp_path):
+    path = str(tmp_path / 'sock')
+    stale = make_server(Tool, path)
+    stale.socket.close()
+    with make_server(Tool, path):
+        pass
+
+
+class _Blocking(io.StringIO):
+    def read(self, *args):
+        raise AssertionError('read the stdin of the server')
+
+    readline = __iter__ = __next__ = read
+
+
+def test_call_does_not_read_server_stdin(server, monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', _Blocking())
+    assert call(server, ['tool', 'count']) == ('0\n', '', 0)
+    stdout, stderr, code = call(server, ['--batch', '-'])
+    assert (stdout, code) == ('', 1)
+    assert '--batch -' in stderr
+    assert call(server, ['calc', 'double', '--number', '2']) == ('4\n', '', 0)
+
+
+def _send(path, data):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(data)
+        s.shutdown(socket.SHUT_WR)
+        with s.makefile('rb') as f:
+            return f.read()
+
+
+@pytest.mark.parametrize('request_line', [
+    b'not json\n',
+    b'[]\n',
+    b'{"cwd": "/"}\n',
+    b'{"argv": "calc double"}\n',
+    b'{"argv": ["calc"], "cwd": 5}\n',
+    b'{"argv": ["calc"], "cwd": "/does/not/exist"}\n',
+])
+def test_bad_requests_are_answered(server, request_line):
+    response = json.loads(_send(server, request_line))
+    assert response['stdout'] == ''
+    assert response['stderr'].startswith('Bad request: ')
+    assert response['code'] == 1
+
+
+def test_empty_requests_are_ignored(server, capfd):
+    assert _send(server, b'') == b''
+    with pytest.raises(OSError):
+        make_server(Tool, server)  # probes the live server with an empty request
+    # requests are served one at a time, so the empty ones have been handled by now
+    assert call(server, ['calc', 'double', '--number', '1']) == ('2\n', '', 0)
+    assert 'Traceback' not in capfd.readouterr().err
+
+
+def test_client_reports_missing_response(tmp_path, capsys):
+    path = str(tmp_path / 'sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen()
+
+        def _close_without_answering():
+            connection, _ = listener.accept()
+            connection.recv(1024)
+            connection.close()
+        t = threading.Thread(target=_close_without_answering)
+        t.start()
+        with pytest.raises(SystemExit) as e:
+            main([path, 'calc'])
+        t.join()
+    assert e.value.code == 1
+    assert capsys.readouterr().err == f'The server on {path} closed the connection without a response\n'
@@ -0,0 +1,73 @@
+import sys
+
+import pytest
+
+from water_cli.parser import Namespace, MCallable, import_string, execute_command
+from water_cli.exceptions import BadSubcommand
+from tests import module
+
+
+def version():
+    return '1.0'
+
+
+CLI = {
+    'version': version,
+    'db': 'tests.lazy_target:DB',
+    'status': 'tests.lazy_target:status',
+    'broken': 'tests.this_module_does_not_exist:Nope',
+    'nested': {'mod': 'tests.module'},
+}
+
+
+@pytest.fixture(autouse=True)
+def _unload():
+    sys.modules.pop('tests.lazy_target', None)
+
+
+def test_import_string():
+    assert import_string('tests.module') is module
+    assert import_string('tests.module:ClassInMod') is module.ClassInMod
+    assert import_string('tests.module:ClassInMod.fn') is module.ClassInMod.fn
+
+
+def test_lazy_does_not_import_until_dispatched():
+    ns = Namespace.from_callable(CLI, name='tool', lazy=True)
+    assert execute_command(ns, 'version') == '1.0'
+    assert 'tests.lazy_target' not in sys.modules
+
+    assert execute_command(ns, 'db migrate --version 3') == 'migrated to 3'
+    assert 'tests.lazy_target' in sys.modules
+
+
+def test_lazy_bad_subcommand_does_not_import():
+    ns = Namespace.from_callable(CLI, name='tool', lazy=True)
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'nope')
+    assert e.value.valid_options == ['version', 'db', 'status', 'broken', 'nested']
+    assert 'tests.lazy_target' not in sys.modules
+
+
+def test_lazy_broken_import_only_fails_when_dispatched():
+    ns = Namespace.from_callable(CLI, name='tool', lazy=True)
+    assert execute_command(ns, 'version') == '1.0'
+    with pytest.raises(ImportError):
+        execute_command(ns, 'broken')
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_mapping_entries(lazy):
+    cli = {k: v for k, v in CLI.items() if k != 'broken'}
+    ns = Namespace.from_callable(cli, name='tool', lazy=lazy)
+    assert isinstance(ns.find('status'), MCallable)
+    assert isinstance(ns.find('db'), Namespace)
+    assert [c.name for c in ns.callables] == ['version', 'status']
+    assert [m.name for m in ns.members] == ['db', 'nested']
+    assert execute_command(ns, 'status') == 'ok'
+    assert execute_command(ns, 'nested mod ClassInMod fn --x 2') == 2
+
+
+def test_string_root():
+    ns = Namespace.from_callable('tests.lazy_target:DB')
+    assert ns.name == 'DB'
+    assert execute_command(ns, 'migrate --version 1') == 'migrated to 1'
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# time spent running the code of `water_cli` modules while `simple_cli` is imported, as a
+# fraction of the time spent importing everything else in the same process (the interpreter
+# start up, `typing`, `inspect`, ...): about 0.25 here. A ratio, so that it holds on slow or
+# busy machines
+IMPORT_BUDGET = 0.6
+
+
+def _python(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+
+def _new_modules(statement):
+    out = _python('-c', f'import sys; before = set(sys.modules); {statement}; '
+                        f'print(" ".join(sorted(set(sys.modules) - before)))').stdout
+    return set(out.split())
+
+
+def _import_times(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+    env['PYTHONPATH'] = ROOT
+    # `-X importtime` doesn't see `importlib.import_module`, which `water_cli.__getattr__`
+    # uses, so this imports the module `simple_cli` is found in directly
+    command = [sys.executable, '-X', f'pycache_prefix={tmp_path}', '-X', 'importtime', '-c', 'import water_cli.utils']
+    lines = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stderr.splitlines()
+    own = other = 0
+    for line in lines[1:]:  # the header
+        self_us, _, name = line[len('import time:'):].split('|')
+        if name.strip().startswith('water_cli'):
+            own += int(self_us)
+        else:
+            other += int(self_us)
+    return own, other
+
+
+def test_import_time_budget(tmp_path):
+    _import_times(tmp_path)  # writes the bytecode
+    ratios = [own / other for own, other in (_import_times(tmp_path) for _ in range(5))]
+    assert min(ratios) < IMPORT_BUDGET, ratios
+
+
+def test_import_is_lazy():
+    assert _new_modules('import water_cli') == {'water_cli'}
+
+
+@pytest.mark.parametrize('statement', ['from water_cli import simple_cli', 'from water_cli import Flag'])
+def test_simple_cli_imports(statement):
+    imported = _new_modules(statement)
+    assert 'water_cli.parser' in imported
+    for module in ['water_cli.batch', 'water_cli.daemon', 'water_cli.profiling', 'water_cli.snapshot',
+                   'water_cli.completion', 'water_cli.suggestions', 'water_cli.cache', 'sqlite3', 'shlex', 'typing_extensions', 'tempfile', 'asyncio']:
+        assert module not in imported
+
+
+def test_patterns_compiled_on_first_use():
+    # `re` itself is already imported by `typing` and `inspect`
+    out = _python('-c', 'from water_cli import parser; print(parser._WITH_EQUAL, parser._SYNTAX)').stdout
+    assert out.split() == ['None', '{}']
+
+
+def test_lazy_attributes():
+    import water_cli
+    from water_cli import parser, batch, utils, exceptions
+    assert water_cli.execute_batch is batch.execute_batch
+    assert water_cli.simple_cli is utils.simple_cli
+    assert water_cli.Packed is parser.Packed
+    assert water_cli.exceptions is exceptions
+    assert set(water_cli.__all__) <= set(dir(water_cli))
+    with pytest.raises(AttributeError):
+        water_cli.nope
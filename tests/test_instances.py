@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+import pytest
+
+from water_cli.parser import Namespace, compile, execute_command
+from water_cli.snapshot import SnapshotNamespace, load_or_build
+
+constructed = []
+
+
+class Group:
+    def __init__(self):
+        constructed.append(self)
+
+    class Connection:
+        def __init__(self):
+            constructed.append(self)
+
+        def query(self, q: str):
+            return q
+
+    def identity(self):
+        return id(self)
+
+    @staticmethod
+    def static(a: int):
+        return a
+
+    @classmethod
+    def klass(cls, a: int):
+        return cls.__name__, a
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    constructed.clear()
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_building_does_not_instantiate(lazy):
+    ns = Namespace.from_callable(Group, lazy=lazy)
+    ns.members, ns.callables
+    assert constructed == []
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_only_dispatched_class_is_instantiated(lazy):
+    ns = Namespace.from_callable(Group, lazy=lazy)
+    assert execute_command(ns, 'Connection query --q hi') == 'hi'
+    assert len(constructed) == 1
+    assert isinstance(constructed[0], Group.Connection)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_self_is_not_a_parameter(lazy):
+    ns = Namespace.from_callable(Group, lazy=lazy)
+    identity = ns.find('identity')
+    assert identity.args == []
+    assert identity.bind
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_static_and_class_methods_do_not_instantiate(lazy):
+    ns = Namespace.from_callable(Group, lazy=lazy)
+    assert execute_command(ns, 'static --a 1') == 1
+    assert execute_command(ns, 'klass --a 2') == ('Group', 2)
+    assert constructed == []
+
+
+def test_fresh_instance_per_dispatch():
+    ns = Namespace.from_callable(Group)
+    execute_command(ns, 'identity')
+    execute_command(ns, 'identity')
+    assert len(constructed) == 2
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_reuse_instances(lazy):
+    ns = compile(Group, lazy=lazy, reuse_instances=True)
+    first = execute_command(ns, 'identity')
+    second = execute_command(ns, 'identity')
+    execute_command(ns, 'Connection query --q a')
+    execute_command(ns, 'Connection query --q b')
+    assert first == second
+    assert len(constructed) == 2
+
+
+def test_instance_root():
+    group = Group()
+    constructed.clear()
+    ns = Namespace.from_callable(group, name='group')
+    assert execute_command(ns, 'identity') == id(group)
+    assert constructed == []
+
+
+def echo(text: str):
+    return text
+
+
+class Assigned:
+    def __init__(self):
+        constructed.append(self)
+        self.extra = Group.Connection
+        self.echo = echo
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_members_assigned_in_init(lazy):
+    ns = Namespace.from_callable(Assigned, lazy=lazy)
+    assert execute_command(ns, 'extra query --q hi') == 'hi'
+    assert execute_command(ns, 'echo --text hey') == 'hey'
+
+
+def test_members_assigned_in_init_from_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    load_or_build(Assigned)
+    ns = load_or_build(Assigned)
+    assert isinstance(ns, SnapshotNamespace)
+    assert execute_command(ns, 'extra query --q hi') == 'hi'
+
+
+class Plain:
+    def hi(self):
+        return 'hi'
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_classes_without_init_are_not_instantiated_on_a_miss(lazy):
+    with patch.object(Namespace, 'instance', side_effect=AssertionError):
+        assert Namespace.from_callable(Plain, lazy=lazy).find('nope') is None
@@ -0,0 +1,71 @@
+import pytest
+
+from water_cli.parser import LazyNamespace, Namespace, MCallable, execute_command
+from water_cli.exceptions import BadSubcommand
+from tests import module
+
+constructed = []
+
+
+class Tree:
+    class Used:
+        def __init__(self):
+            constructed.append('Used')
+
+        def fn(self, a: int):
+            return a
+
+    class Unused:
+        def __init__(self):
+            constructed.append('Unused')
+
+        def fn(self):
+            pass
+
+    a_module = module
+
+    def top(self):
+        return 'top'
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    constructed.clear()
+
+
+def test_lazy_only_reflects_dispatched_branch():
+    ns = Namespace.from_callable(Tree, lazy=True)
+    assert isinstance(ns, LazyNamespace)
+    assert execute_command(ns, 'Used fn --a 1') == 1
+    assert constructed == ['Used']
+
+
+def test_lazy_find_is_memoized():
+    ns = Namespace.from_callable(Tree, lazy=True)
+    assert ns.find('Used') is ns.find('Used')
+    assert ns.find('does_not_exist') is None
+    assert isinstance(ns.find('top'), MCallable)
+
+
+def test_lazy_listing_matches_eager():
+    lazy = Namespace.from_callable(Tree, lazy=True)
+    eager = Namespace.from_callable(Tree)
+    assert [m.name for m in lazy.members] == [m.name for m in eager.members]
+    assert [c.name for c in lazy.callables] == [c.name for c in eager.callables]
+    assert lazy.members[0] is lazy.find(lazy.members[0].name)
+
+
+def test_lazy_module_members():
+    ns = Namespace.from_callable(Tree, lazy=True)
+    mod = ns.find('a_module')
+    assert isinstance(mod, Namespace)
+    assert [m.name for m in mod.members] == ['ClassInMod']
+    assert execute_command(ns, 'a_module ClassInMod fn --x 3') == 3
+
+
+def test_lazy_bad_subcommand():
+    ns = Namespace.from_callable(Tree, lazy=True)
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'Used nope')
+    assert e.value.parent == ['Tree', 'Used']
+    assert e.value.valid_options == ['__init__', 'fn']
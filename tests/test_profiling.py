@@ -0,0 +1,73 @@
+import io
+import sys
+
+import pytest
+
+from unittest.mock import patch
+
+from water_cli import simple_cli
+from water_cli.exceptions import IncorrectType
+from water_cli.parser import execute_command
+from water_cli.profiling import PhaseEvent, Report, add_hook, remove_hook
+
+
+class Tool:
+    class Remote:
+        def add(self, name: str, port: int = 22):
+            return f'{name}:{port}'
+
+
+@pytest.fixture
+def events():
+    collected = []
+    add_hook(collected.append)
+    yield collected
+    remove_hook(collected.append)
+
+
+def test_events(events):
+    assert execute_command(Tool, 'Remote add --name origin') == 'origin:22'
+    assert [e.phase for e in events] == ['compile', 'resolve', 'tokenize', 'parse', 'cast', 'call']
+    assert {e.command for e in events} == {('Remote', 'add')}
+    assert all(isinstance(e, PhaseEvent) and e.duration >= 0 for e in events)
+
+
+def test_events_stop_at_failing_phase(events):
+    with pytest.raises(IncorrectType):
+        execute_command(Tool, 'Remote add --name origin --port nope')
+    assert [e.phase for e in events] == ['compile', 'resolve', 'tokenize', 'parse', 'cast']
+
+
+def test_removed_hook_is_not_called():
+    collected = []
+    add_hook(collected.append)
+    remove_hook(collected.append)
+    execute_command(Tool, 'Remote add --name origin')
+    assert collected == []
+
+
+def test_report():
+    report = Report()
+    for phase, duration in [('compile', 0.001), ('call', 0.002), ('compile', 0.0005)]:
+        report(PhaseEvent(('a', 'b') if duration > 0.0005 else (), phase, duration))
+    out = io.StringIO()
+    report.write(out)
+    assert out.getvalue().splitlines() == [
+        'water profile: a b',
+        '  compile        1.000 ms',
+        '  call           2.000 ms',
+        '  total          3.000 ms',
+        'water profile: (no command)',
+        '  compile        0.500 ms',
+        '  total          0.500 ms',
+    ]
+
+
+def test_simple_cli_profile(capsys, monkeypatch):
+    monkeypatch.setenv('WATER_PROFILE', '1')
+    with patch('sys.argv', [sys.argv[0], 'Remote', 'add', '--name', 'x']):
+        simple_cli(Tool)
+    captured = capsys.readouterr()
+    assert captured.out == 'x:22\n'
+    assert captured.err.startswith('water profile: Remote add\n  compile')
+    assert 'total' in captured.err
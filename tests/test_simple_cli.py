@@ -1,5 +1,8 @@
+import os
+import subprocess
 import sys
-from examples import calculator
+
+from examples import calculator, namespaces
 from water_cli import simple_cli
 from unittest.mock import patch
 
@@ -23,3 +26,86 @@ def test_simple_cli_ok_command(capsys):
         simple_cli(calculator.Calculator)
     captured = capsys.readouterr()
     assert captured.out.strip() == "20"
+
+
+def test_simple_cli_passes_argv_through(capsys):
+    with patch("sys.argv", [sys.argv[0], "String", "reverse", "--string", "it's \"quoted\""]):
+        simple_cli(namespaces.Tools)
+    captured = capsys.readouterr()
+    assert captured.out.strip() == "\"detouq\" s'ti"
+
+
+class Export:
+    def rows(self, n: int):
+        return (f'row {i}' for i in range(n))
+
+    def squares(self, n: int):
+        return map(lambda i: i * i, range(n))
+
+    def listed(self):
+        return [1, 2]
+
+
+def test_simple_cli_streams_iterators(capsys):
+    with patch("sys.argv", [sys.argv[0], "rows", "--n", "3"]):
+        simple_cli(Export)
+    assert capsys.readouterr().out == "row 0\nrow 1\nrow 2\n"
+
+    with patch("sys.argv", [sys.argv[0], "squares", "--n", "4"]):
+        simple_cli(Export)
+    assert capsys.readouterr().out == "0\n1\n4\n9\n"
+
+    with patch("sys.argv", [sys.argv[0], "listed"]):
+        simple_cli(Export)
+    assert capsys.readouterr().out == "[1, 2]\n"
+
+
+def test_simple_cli_stream_broken_pipe():
+    program = (
+        "import itertools\n"
+        "from water_cli import simple_cli\n"
+        "def forever():\n"
+        "    return itertools.count()\n"
+        "simple_cli(forever)\n"
+    )
+    proc = subprocess.Popen([sys.executable, "-c", program, "forever"], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    assert proc.stdout.readline() == b"0\n"
+    proc.stdout.close()
+    assert proc.wait(timeout=10) == 1
+    assert proc.stderr.read() == b""
+
+
+def test_simple_cli_batch_broken_pipe(tmp_path):
+    program = (
+        "from water_cli import simple_cli\n"
+        "def hello():\n"
+        "    return 'hello'\n"
+        "simple_cli(hello)\n"
+    )
+    batch = tmp_path / "commands.txt"
+    batch.write_text("hello\n" * 100_000)
+    proc = subprocess.Popen([sys.executable, "-c", program, "--batch", str(batch)], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    assert proc.stdout.readline() == b"hello\n"
+    proc.stdout.close()
+    assert proc.wait(timeout=10) == 1
+    assert proc.stderr.read() == b""
+
+
+def test_simple_cli_suggests_commands(capsys):
+    with patch("sys.argv", [sys.argv[0], "doubel"]):
+        simple_cli(calculator.Calculator)
+    assert capsys.readouterr().out.strip() == "No top-level command 'doubel'. Did you mean: double?"
+
+
+class Scale:
+    def resize(self, width: int = 1, height: int = 1):
+        return width * height
+
+
+def test_simple_cli_suggests_parameters(capsys):
+    with patch("sys.argv", [sys.argv[0], "resize", "--widht", "1", "--nope", "2"]):
+        simple_cli(Scale)
+    assert capsys.readouterr().out.strip() == ("Unexpected parameters: --nope, --widht. "
+                                               "Did you mean --width instead of --widht?")
@@ -0,0 +1,167 @@
+import enum
+import json
+import sys
+
+import pytest
+
+from water_cli import snapshot
+from water_cli.parser import Flag, Namespace, Repeated, compile, execute_command, invalidate
+from water_cli.exceptions import BadSubcommand, IncorrectType, MissingParameters
+from water_cli.snapshot import SnapshotNamespace, load_or_build, snapshot_path
+
+
+class Color(enum.Enum):
+    red = 1
+    blue = 2
+    crimson = 1  # an alias of red, which is not a choice
+
+
+class Tool:
+    """Tool docs."""
+    class Remote:
+        def add(self, name: str, url: str = 'https://example.com'):
+            """Add a remote."""
+            return f'{name}={url}'
+
+    def paint(self, color: Color, force: Flag, tags: Repeated[str] = None, size: float = 1.0):
+        return color, bool(force), tags, size
+
+    @staticmethod
+    def version():
+        return '1.0'
+
+
+def hello(name: str, times: int = 1):
+    return ' '.join([f'hello {name}'] * times)
+
+
+CLI = {
+    'tool': Tool,
+    'db': 'tests.lazy_target:DB',
+}
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    invalidate()
+    yield tmp_path
+    invalidate()
+
+
+def _snapshot_of(c):
+    with open(snapshot_path(c)) as f:
+        return json.load(f)
+
+
+def test_written_then_loaded():
+    first = load_or_build(Tool)
+    assert not isinstance(first, SnapshotNamespace)
+    second = load_or_build(Tool)
+    assert isinstance(second, SnapshotNamespace)
+
+    for ns in [first, second]:
+        assert execute_command(ns, 'paint --color red --force --tags a --tags b') == (Color.red, True, ['a', 'b'], 1.0)
+        assert execute_command(ns, 'paint --color blue --size 2') == (Color.blue, False, None, 2.0)
+        assert execute_command(ns, 'Remote add --name origin') == 'origin=https://example.com'
+        assert execute_command(ns, 'version') == '1.0'
+        assert ns.option_names() == first.option_names()
+
+
+def test_errors_from_snapshot():
+    load_or_build(Tool)
+    ns = load_or_build(Tool)
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'Remote nope')
+    assert e.value.valid_options == ['add']
+    with pytest.raises(MissingParameters):
+        execute_command(ns, 'Remote add')
+    with pytest.raises(IncorrectType):
+        execute_command(ns, 'paint --color green')
+
+
+def test_contents():
+    load_or_build(Tool)
+    data = _snapshot_of(Tool)
+    assert data['tree']['doc'] == 'Tool docs.'
+    assert any(path.endswith('test_snapshot.py') for path in data['files'])
+
+    paint = next(c for c in data['tree']['callables'] if c['name'] == 'paint')
+    assert [a['name'] for a in paint['args']] == ['color', 'force', 'tags', 'size']
+    assert paint['args'][0]['annotation'] == {'type': 'enum', 'ref': 'tests.test_snapshot:Color',
+                                              'choices': ['red', 'blue']}
+    assert paint['args'][1]['annotation'] == {'type': 'flag'}
+    assert paint['args'][3]['default'] == 1.0
+
+
+def test_function_root():
+    load_or_build(hello)
+    ns = load_or_build(hello)
+    assert isinstance(ns, SnapshotNamespace)
+    assert execute_command(ns, 'hello --name you --times 2') == 'hello you hello you'
+
+
+def test_only_imports_dispatched_path():
+    load_or_build(CLI)
+    sys.modules.pop('tests.lazy_target', None)
+
+    ns = load_or_build(CLI)
+    with pytest.raises(MissingParameters):
+        execute_command(ns, 'db migrate')
+    assert execute_command(ns, 'tool version') == '1.0'
+    assert 'tests.lazy_target' not in sys.modules
+
+    assert execute_command(ns, 'db migrate --version 2') == 'migrated to 2'
+    assert 'tests.lazy_target' in sys.modules
+
+
+@pytest.mark.parametrize('key, value', [('version', '0.0.0'), ('format', 0)])
+def test_stale_version(key, value):
+    load_or_build(Tool)
+    data = _snapshot_of(Tool)
+    data[key] = value
+    with open(snapshot_path(Tool), 'w') as f:
+        json.dump(data, f)
+
+    assert not isinstance(load_or_build(Tool), SnapshotNamespace)
+    assert isinstance(load_or_build(Tool), SnapshotNamespace)
+
+
+def test_stale_source():
+    load_or_build(Tool)
+    data = _snapshot_of(Tool)
+    data['files'] = {path: 0 for path in data['files']}
+    with open(snapshot_path(Tool), 'w') as f:
+        json.dump(data, f)
+
+    assert not isinstance(load_or_build(Tool), SnapshotNamespace)
+    assert _snapshot_of(Tool)['files'] != data['files']
+
+
+def test_corrupt_snapshot():
+    load_or_build(Tool)
+    with open(snapshot_path(Tool), 'w') as f:
+        f.write('{')
+    assert execute_command(load_or_build(Tool), 'version') == '1.0'
+    assert isinstance(load_or_build(Tool), SnapshotNamespace)
+
+
+def test_unwritable_cache(cache, monkeypatch):
+    blocker = cache / 'file'
+    blocker.write_text('')
+    monkeypatch.setenv('WATER_CACHE_DIR', str(blocker / 'sub'))
+    assert execute_command(load_or_build(Tool), 'version') == '1.0'
+
+
+def test_compile_snapshot():
+    load_or_build(Tool)
+    ns = compile(Tool, snapshot=True)
+    assert isinstance(ns, SnapshotNamespace)
+    assert compile(Tool, snapshot=True) is ns
+    assert compile(Tool) is not ns
+
+
+def test_cache_dir(monkeypatch):
+    monkeypatch.delenv('WATER_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', '/xdg')
+    assert snapshot.cache_dir() == '/xdg/water_cli'
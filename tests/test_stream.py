@@ -0,0 +1,101 @@
+import io
+import sys
+
+from typing import Iterator
+
+import pytest
+
+from water_cli import Stream
+from water_cli.parser import execute_command
+from water_cli.exceptions import IncorrectType, UnexpectedParameters
+from water_cli.snapshot import SnapshotNamespace, load_or_build
+
+
+class Logs:
+    def total(self, numbers: Stream[int]):
+        return sum(numbers)
+
+    def lines(self, source: Stream[str]):
+        return list(source)
+
+    def head(self, source: Iterator[int], n: int = 2):
+        return [next(source) for _ in range(n)]
+
+    def optional(self, source: Stream[str] = None):
+        return source
+
+
+@pytest.fixture
+def numbers(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('1\n2\n3\n')
+    return path
+
+
+def test_stream_from_file(numbers):
+    assert execute_command(Logs, f'total --numbers @{numbers}') == 6
+    assert execute_command(Logs, f'lines --source @{numbers}') == ['1', '2', '3']
+    assert execute_command(Logs, f'head --source @{numbers}') == [1, 2]
+
+
+def test_stream_from_stdin(monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('4\n5'))
+    assert execute_command(Logs, 'total --numbers -') == 9
+
+
+def test_stream_defaults_to_stdin(monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('a\nb\n'))
+    assert execute_command(Logs, 'lines') == ['a', 'b']
+
+
+def test_stream_with_default_is_optional():
+    assert execute_command(Logs, 'optional') is None
+
+
+def test_stream_is_lazy(monkeypatch):
+    stdin = io.StringIO('1\n2\nnot a number\n')
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    assert execute_command(Logs, 'head --source -') == [1, 2]
+    assert stdin.readline() == 'not a number\n'
+
+
+def test_stream_bad_line(monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('1\ntwo\n'))
+    with pytest.raises(IncorrectType) as e:
+        execute_command(Logs, 'total')
+    assert e.value.provided_value == 'two'
+    assert e.value.expected_type == 'int'
+
+
+def test_stream_bad_source(tmp_path):
+    with pytest.raises(IncorrectType):
+        execute_command(Logs, 'total --numbers 1')
+    with pytest.raises(IncorrectType):
+        execute_command(Logs, f'total --numbers @{tmp_path / "missing"}')
+
+
+def test_stream_closes_file(numbers, monkeypatch):
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        opened.append(f)
+        return f
+    monkeypatch.setattr('builtins.open', tracking_open)
+    execute_command(Logs, f'lines --source @{numbers}')
+    assert opened and opened[0].closed
+
+
+def test_stream_unexpected_parameters():
+    with pytest.raises(UnexpectedParameters):
+        execute_command(Logs, 'total --nope 1')
+
+
+def test_stream_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    load_or_build(Logs)
+    ns = load_or_build(Logs)
+    assert isinstance(ns, SnapshotNamespace)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('1\n2\n'))
+    assert execute_command(ns, 'total') == 3
@@ -0,0 +1,87 @@
+import pickle
+import random
+
+import pytest
+
+from water_cli.exceptions import BadSubcommand, UnexpectedParameters
+from water_cli.parser import compile, execute_command
+from water_cli.suggestions import SuggestionIndex, distance
+from water_cli.snapshot import load_or_build
+
+
+class Tool:
+    class database:
+        def migrate(self, target: int = 0, dry_run: bool = False):
+            pass
+
+        def dump(self):
+            pass
+
+    def deploy(self):
+        pass
+
+    def destroy(self):
+        pass
+
+
+def test_distance():
+    assert distance('', 'abc') == 3
+    assert distance('kitten', 'sitting') == 3
+    assert distance('ab', 'ba') == 1
+    assert distance('deploy', 'dpeloy') == 1
+
+
+def test_suggest_ranking():
+    index = SuggestionIndex(['deploy', 'destroy', 'deplay', 'status', 'deploys'])
+    assert index.suggest('deploy') == ['deplay', 'deploys']
+    assert index.suggest('deploy', limit=1) == ['deplay']
+    assert index.suggest('dploy') == ['deploy']
+    assert index.suggest('deplyo') == ['deploy', 'deplay']
+    assert index.suggest('zzz') == []
+    assert index.suggest('x') == []
+
+
+def test_suggest_matches_brute_force():
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcd') for _ in range(rng.randint(2, 6))) for _ in range(200)]
+    index = SuggestionIndex(words)
+    for _ in range(300):
+        word = ''.join(rng.choice('abcd') for _ in range(rng.randint(2, 6)))
+        found = index.suggest(word, limit=len(words))
+        assert all(distance(word, w) <= 2 for w in found)
+        assert [w for w in found if distance(word, w) == 1] == \
+            sorted(w for w in set(words) if w != word and distance(word, w) == 1)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_bad_subcommand_suggestions(lazy):
+    ns = compile(Tool, lazy=lazy)
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'dploy')
+    assert e.value.suggestions == ['deploy']
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'database dupm')
+    assert e.value.suggestions == ['dump']
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'something')
+    assert e.value.suggestions == []
+
+
+def test_unexpected_parameters_suggestions():
+    with pytest.raises(UnexpectedParameters) as e:
+        execute_command(Tool, 'database migrate --targte 1 --dry_rn 1 --verbose 1')
+    assert e.value.suggestions == {'dry_rn': ['dry_run'], 'targte': ['target'], 'verbose': []}
+
+
+def test_suggestions_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    load_or_build(Tool)
+    ns = load_or_build(Tool)
+    with pytest.raises(BadSubcommand) as e:
+        execute_command(ns, 'databse dump')
+    assert e.value.suggestions == ['database']
+
+
+def test_suggestions_pickle():
+    e = pickle.loads(pickle.dumps(BadSubcommand(['Tool'], 'dploy', ['deploy'], ['deploy'])))
+    assert e.suggestions == ['deploy']
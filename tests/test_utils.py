@@ -1,7 +1,9 @@
+import functools
 import pytest
 
-from typing import Optional
-from water_cli.parser import Flag
+from typing import List, Optional
+from water_cli.parser import Flag, constraints_of, execute_command
+from water_cli.snapshot import SnapshotNamespace, load_or_build
 from water_cli.utils import exclusive_flags, required_together
 from water_cli.exceptions import ExclusiveFlags, MissingRequiredCombination
 
@@ -92,3 +94,82 @@ def test_passing_bad_decorator_arguments(decorator):
         def a_function(*, a: Flag, b: Flag):
             pass
     assert str(e.value) == f"Received arguments: ('c', 'd') for decorator, which are not accepted by 'a_function'."
+
+
+calls = []
+
+def counting(f):
+    @functools.wraps(f)
+    def wrapped(*args, **kwargs):
+        calls.append(f.__name__)
+        return f(*args, **kwargs)
+    return wrapped
+
+class Constrained:
+    @exclusive_flags([("json", "csv")])
+    @required_together([("user", "password")])
+    def export(self, rows: List[int] = None, json: Flag = False, csv: Flag = False,
+               user: str = None, password: str = None):
+        return rows
+
+    @counting
+    @exclusive_flags([("json", "csv")])
+    def logged(self, json: Flag, csv: Flag):
+        return 'logged'
+
+
+def test_constraints_are_attached():
+    constraints = constraints_of(Constrained.export)
+    assert constraints.checks == (('exclusive', ('json', 'csv')), ('together', ('user', 'password')))
+    assert constraints.target.__name__ == 'export'
+    assert constraints_of(constraints.target) is None
+    # a decorator which copied the attribute must still be called
+    assert constraints_of(Constrained.logged) is None
+
+
+def test_constraints_checked_before_cast():
+    with pytest.raises(ExclusiveFlags):
+        execute_command(Constrained, 'export --rows not,ints --json --csv')
+    with pytest.raises(MissingRequiredCombination) as e:
+        execute_command(Constrained, 'export --rows not,ints --password x')
+    assert e.value.present_flags == ('password',)
+    assert e.value.required_combination == ('user',)
+    assert execute_command(Constrained, 'export --rows 1,2 --json --user a --password b') == [1, 2]
+
+
+def test_constraints_outer_first():
+    with pytest.raises(ExclusiveFlags):
+        execute_command(Constrained, 'export --json --csv --user a')
+
+
+def test_dispatch_skips_wrappers(monkeypatch):
+    checked = []
+    monkeypatch.setattr('water_cli.utils._check_kwargs_exclusive', lambda *args: checked.append(args))
+    execute_command(Constrained, 'export --json --user a --password b')
+    assert checked == []
+    Constrained().export(json=Flag(True))
+    assert len(checked) == 1
+
+
+def test_dispatch_calls_other_decorators():
+    calls.clear()
+    assert execute_command(Constrained, 'logged --json') == 'logged'
+    assert calls == ['logged']
+    with pytest.raises(ExclusiveFlags):
+        execute_command(Constrained, 'logged --json --csv')
+
+
+def test_constraints_on_instances():
+    with pytest.raises(ExclusiveFlags):
+        execute_command({'tool': Constrained()}, 'tool export --json --csv')
+    assert execute_command({'tool': Constrained()}, 'tool export --rows 3 --json') == [3]
+
+
+def test_constraints_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('WATER_CACHE_DIR', str(tmp_path))
+    load_or_build(Constrained)
+    ns = load_or_build(Constrained)
+    assert isinstance(ns, SnapshotNamespace)
+    with pytest.raises(ExclusiveFlags):
+        execute_command(ns, 'export --rows not,ints --json --csv')
+    assert execute_command(ns, 'export --rows 1 --csv') == [1]
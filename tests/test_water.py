@@ -1,7 +1,9 @@
+import asyncio
+
 import pytest
 
 from typing import List, Optional, Union
-from water_cli.parser import execute_command, BadArguments, Flag, Repeated, MissingValues
+from water_cli.parser import execute_command, execute_argv, BadArguments, Flag, Repeated, MissingValues
 from water_cli.utils import exclusive_flags, required_together
 from water_cli.exceptions import ExclusiveFlags, MissingRequiredCombination
 
@@ -196,3 +198,28 @@ def test_required_combinations_no_conflict():
 def test_required_combinations_conflict():
     with pytest.raises(MissingRequiredCombination) as e:
         execute_command(Str, 'upper_word_sometimes --value "this is a sentence" --uppercase')
+
+
+def test_execute_argv():
+    res = execute_argv(Str, ['spaces_to_dashes', '--text', 'this text has "quotes" and spaces'])
+    assert res == 'this-text-has-"quotes"-and-spaces'
+
+
+def test_execute_argv_matches_execute_command():
+    assert execute_argv(Math1, ['add', '--a', '10', '--b=5.1']) == execute_command(Math1, 'add --a 10 --b=5.1')
+
+
+class Async:
+    async def add(self, a: int, b: int):
+        await asyncio.sleep(0)
+        return a + b
+
+
+def test_async_command():
+    assert execute_command(Async, 'add --a 1 --b 2') == 3
+
+
+def test_async_command_in_running_loop():
+    async def main():
+        return await execute_command(Async, 'add --a 1 --b 2')
+    assert asyncio.run(main()) == 3
@@ -1,5 +1,48 @@
-from water_cli.parser import execute_command, Flag, Repeated
-from water_cli import exceptions
-from water_cli.utils import simple_cli, required_together, exclusive_flags
+"""
+Submodules are imported the first time one of their names is used (PEP 562), so
+`import water_cli` costs next to nothing and a command only pays for what it uses.
+"""
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List
+    from water_cli.parser import execute_command, execute_argv, compile, invalidate, Flag, Repeated, Stream, MappedFile, Packed
+    from water_cli import exceptions
+    from water_cli.batch import execute_batch, BatchResult
+    from water_cli.utils import simple_cli, required_together, exclusive_flags
+    from water_cli.cache import cached
+
 __version__ = '0.1.15'
-__all__ = ['execute_command', 'Flag', 'Repeated', 'exceptions', 'simple_cli', 'required_together', 'exclusive_flags']
+__all__ = ['execute_command', 'execute_argv', 'compile', 'invalidate', 'execute_batch', 'BatchResult', 'Flag', 'Repeated', 'Stream', 'MappedFile', 'Packed', 'exceptions', 'simple_cli', 'required_together', 'exclusive_flags', 'cached']
+
+_LOCATIONS = {
+    'execute_command': 'water_cli.parser',
+    'execute_argv': 'water_cli.parser',
+    'compile': 'water_cli.parser',
+    'invalidate': 'water_cli.parser',
+    'Flag': 'water_cli.parser',
+    'Repeated': 'water_cli.parser',
+    'Stream': 'water_cli.parser',
+    'MappedFile': 'water_cli.parser',
+    'Packed': 'water_cli.parser',
+    'execute_batch': 'water_cli.batch',
+    'BatchResult': 'water_cli.batch',
+    'simple_cli': 'water_cli.utils',
+    'required_together': 'water_cli.utils',
+    'exclusive_flags': 'water_cli.utils',
+    'cached': 'water_cli.cache',
+}
+
+
+def __getattr__(name: str) -> object:
+    import importlib
+    if name == 'exceptions':
+        return importlib.import_module('water_cli.exceptions')
+    if name not in _LOCATIONS:
+        raise AttributeError(f"module 'water_cli' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_LOCATIONS[name]), name)
+    globals()[name] = value  # later lookups don't go through __getattr__
+    return value
+
+
+def __dir__() -> 'List[str]':
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,186 @@
+import inspect
+import os
+import shlex
+
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from water_cli.exceptions import BadArguments
+from water_cli.parser import Namespace, _call_args, _parse, apply_args, compile
+
+
+@dataclass
+class BatchResult:
+    line_number: int
+    line: str
+    result: Any = None
+    error: Optional[BadArguments] = None
+
+
+def _execute_line(ns: Namespace, number: int, line: str,
+                  call: Callable[..., Any] = apply_args) -> BatchResult:
+    try:
+        tokens = shlex.split(line)
+    except ValueError as e:
+        return BatchResult(number, line, error=BadArguments(f"Unable to split '{line}': {e}"))
+    try:
+        parsed, kwargs = _parse(ns, tokens)
+        result = call(parsed, kwargs)
+    except BadArguments as e:
+        return BatchResult(number, line, error=e)
+    return BatchResult(number, line, result=result)
+
+
+def _commands(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield number, line
+
+
+def _execute_concurrently(ns: Namespace, commands: Iterator[Tuple[int, str]], concurrency: int) -> Iterator[BatchResult]:
+    """
+    Run coroutines returned by commands on one event loop, at most `concurrency` at a time,
+    yielding results in input order.
+    """
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    pending: Deque[Tuple[BatchResult, Optional['asyncio.Task[Any]']]] = deque()
+
+    def _finish(r: BatchResult, task: Optional['asyncio.Task[Any]']) -> BatchResult:
+        if task is None:
+            return r
+        try:
+            r.result = loop.run_until_complete(task)
+        except BadArguments as e:
+            r.result = None
+            r.error = e
+        return r
+
+    try:
+        for number, line in commands:
+            r = _execute_line(ns, number, line, call=_call_args)
+            task = loop.create_task(r.result) if inspect.iscoroutine(r.result) else None
+            pending.append((r, task))
+            while len(pending) >= concurrency:
+                yield _finish(*pending.popleft())
+        while pending:
+            yield _finish(*pending.popleft())
+    finally:
+        tasks = [task for _, task in pending if task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+_worker_tree: Optional[Namespace] = None
+
+
+def _init_worker(c: Any) -> None:
+    global _worker_tree
+    _worker_tree = compile(c, lazy=True, reuse_instances=True)
+
+
+def _execute_chunk(chunk: List[Tuple[int, str]]) -> List[BatchResult]:
+    assert _worker_tree is not None
+    return [_execute_line(_worker_tree, number, line) for number, line in chunk]
+
+
+def _chunks(commands: Iterator[Tuple[int, str]], size: int) -> Iterator[List[Tuple[int, str]]]:
+    while True:
+        chunk = list(islice(commands, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _execute_in_pool(c: Any, ns: Namespace, commands: Iterator[Tuple[int, str]], executor: str,
+                     workers: Optional[int], chunksize: int) -> Iterator[BatchResult]:
+    """
+    Run commands on a thread or process pool, with a bounded number of chunks in flight,
+    yielding results in input order.
+    """
+    from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+    def _execute_chunk_here(chunk: List[Tuple[int, str]]) -> List[BatchResult]:
+        return [_execute_line(ns, number, line) for number, line in chunk]
+
+    pool: Executor
+    run_chunk: Callable[[List[Tuple[int, str]]], List[BatchResult]]
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=workers)
+        run_chunk = _execute_chunk_here
+    else:
+        # every worker compiles its own tree once, when it starts
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(c,))
+        run_chunk = _execute_chunk
+
+    window = 2 * (workers or os.cpu_count() or 1)
+    pending: Deque['Future[List[BatchResult]]'] = deque()
+    try:
+        for chunk in _chunks(commands, chunksize):
+            pending.append(pool.submit(run_chunk, chunk))
+            while len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def execute_batch(c: Any, lines: Iterable[str], concurrency: int = 1, executor: Optional[str] = None,
+                  workers: Optional[int] = None, chunksize: int = 1) -> Iterator[BatchResult]:
+    """
+    Run every command line in `lines` against one compiled tree, yielding a `BatchResult`
+    per command, in input order, as soon as it completes.
+
+    `lines` is consumed lazily, so it can be an open file of any size. Blank lines and
+    lines starting with '#' are skipped. `BadArguments` raised by a command are reported
+    on its result instead of stopping the batch; any other exception propagates.
+    Classes in the tree are instantiated once and re-used for the whole batch.
+
+    With `concurrency` > 1, `async def` commands run concurrently on a single event
+    loop, with at most `concurrency` commands in flight; otherwise every coroutine is
+    run to completion before the next line is read.
+
+    With `executor='thread'` or `executor='process'`, commands run in parallel on a pool
+    of `workers` threads or processes, sent to them `chunksize` lines at a time. In
+    process pools every worker compiles its own tree once, when it starts, so `c` must
+    be picklable (by reference, as classes, functions and modules are), and so must the
+    results of the commands.
+    """
+    if executor is not None:
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        if concurrency > 1:
+            raise ValueError("'concurrency' only applies to async commands, and can't be combined with 'executor'")
+        if executor == 'process' and isinstance(c, Namespace):
+            raise ValueError("Process pools compile their own trees, pass the root object instead of a Namespace")
+    if chunksize < 1:
+        raise ValueError("'chunksize' must be at least 1")
+    if workers is not None and workers < 1:
+        raise ValueError("'workers' must be at least 1")
+
+    ns = c if isinstance(c, Namespace) else compile(c, lazy=True, reuse_instances=True)
+    return _execute_batch(c, ns, lines, concurrency, executor, workers, chunksize)
+
+
+def _execute_batch(c: Any, ns: Namespace, lines: Iterable[str], concurrency: int, executor: Optional[str],
+                   workers: Optional[int], chunksize: int) -> Iterator[BatchResult]:
+    if executor is not None:
+        yield from _execute_in_pool(c, ns, _commands(lines), executor, workers, chunksize)
+        return
+    if concurrency > 1:
+        yield from _execute_concurrently(ns, _commands(lines), concurrency)
+        return
+    for number, line in _commands(lines):
+        yield _execute_line(ns, number, line)
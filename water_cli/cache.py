@@ -0,0 +1,201 @@
+"""
+Results of commands decorated with `cached`, kept on disk between runs.
+
+Entries live in an SQLite database in the cache directory (see `water_cli.snapshot.cache_dir`),
+keyed by the function, the path of the command and its arguments after casting. Every function
+keeps at most `max_entries` results, evicting the least recently used, and results older than
+`ttl` seconds are not returned.
+
+Caching is best effort: arguments or results which can't be pickled (streams, memory maps,
+generators), and a cache which can't be read or written, just run the command. Commands which
+raise are not cached.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from water_cli.parser import MCallable, _loop_running, _run
+from water_cli.snapshot import cache_dir
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    value BLOB NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+)
+'''
+
+_enabled = True
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: Optional[float]  # seconds; None keeps results until they are evicted
+    max_entries: int
+
+
+def cached(ttl: Optional[float] = None, max_entries: int = 1024) -> Callable[[F], F]:
+    """
+    Keep the results of a command on disk, so running it again with the same arguments
+    returns the stored result without calling it.
+
+    The function itself is returned unchanged: only dispatching through water is cached.
+    """
+    if max_entries < 1:
+        raise ValueError(f'max_entries must be at least 1, got {max_entries}')
+
+    def decorator(f: F) -> F:
+        setattr(f, '__water_cache__', CachePolicy(ttl, max_entries))
+        return f
+    return decorator
+
+
+@contextmanager
+def disabled() -> Iterator[None]:
+    """
+    Run commands without reading or writing cached results; `simple_cli` uses this for `--no-cache`.
+    """
+    global _enabled
+    previous, _enabled = _enabled, False
+    try:
+        yield
+    finally:
+        _enabled = previous
+
+
+def cache_path() -> str:
+    return os.path.join(cache_dir(), 'results.sqlite3')
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    # a transaction, committed unless the block raises
+    path = cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, timeout=5)
+    try:
+        with db:
+            db.execute(_SCHEMA)
+            yield db
+    finally:
+        db.close()
+
+
+def _command_path(c: MCallable) -> List[str]:
+    path = [c.name]
+    parent = c.parent
+    while parent is not None:
+        path.insert(0, parent.name)
+        parent = parent.parent
+    return path
+
+
+def _function_id(c: MCallable) -> str:
+    target = getattr(c.target, '__func__', c.target)
+    return f'{getattr(target, "__module__", "")}:{getattr(target, "__qualname__", c.name)}'
+
+
+def _key(function: str, c: MCallable, casted: Dict[str, Any]) -> str:
+    # raises for arguments which can't be pickled
+    data = pickle.dumps((function, _command_path(c), sorted(casted.items())), protocol=4)
+    return hashlib.sha256(data).hexdigest()
+
+
+def _lookup(db: sqlite3.Connection, key: str, policy: CachePolicy, now: float) -> Optional[bytes]:
+    row = db.execute('SELECT value, created FROM results WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    value, created = row
+    if policy.ttl is not None and now - created > policy.ttl:
+        db.execute('DELETE FROM results WHERE key = ?', (key,))
+        return None
+    db.execute('UPDATE results SET used = ? WHERE key = ?', (now, key))
+    return bytes(value)
+
+
+def _store(db: sqlite3.Connection, key: str, function: str, value: bytes, policy: CachePolicy, now: float) -> None:
+    db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', (key, function, value, now, now))
+    db.execute('DELETE FROM results WHERE function = ? AND key NOT IN '
+               '(SELECT key FROM results WHERE function = ? ORDER BY used DESC LIMIT ?)',
+               (function, function, policy.max_entries))
+
+
+def _remember(key: str, function: str, policy: CachePolicy, now: float, result: Any) -> None:
+    try:
+        data = pickle.dumps(result, protocol=4)
+    except Exception:
+        return
+    try:
+        with _connect() as db:
+            _store(db, key, function, data, policy, now)
+    except (sqlite3.Error, OSError):
+        pass
+
+
+async def _remember_awaited(coroutine: Any, key: str, function: str, policy: CachePolicy, now: float) -> Any:
+    result = await coroutine
+    _remember(key, function, policy, now, result)
+    return result
+
+
+async def _resolved(value: Any) -> Any:
+    return value
+
+
+def call_cached(c: MCallable, casted: Dict[str, Any], policy: CachePolicy, run: bool = True) -> Any:
+    """
+    The stored result of calling `c` with `casted`, calling it (and storing the result) on a miss.
+
+    With `run=False`, or from a running event loop, a coroutine returned by `c` is not run
+    here; a coroutine awaiting it and storing its result is returned instead, for the
+    caller to run.
+    """
+    if not _enabled:
+        result = c.fn(**casted)
+        return _run(result) if run else result
+    function = _function_id(c)
+    try:
+        key = _key(function, c, casted)
+    except Exception:  # anything pickle raises for unsupported objects
+        result = c.fn(**casted)
+        return _run(result) if run else result
+
+    now = time.time()
+    try:
+        with _connect() as db:
+            stored = _lookup(db, key, policy, now)
+        if stored is not None:
+            value = pickle.loads(stored)
+            if _loop_running() and inspect.iscoroutinefunction(c.target):
+                # awaited by the caller, like a miss
+                return _resolved(value)
+            return value
+    except Exception:  # an unreadable cache, or a result whose class is gone, is a miss
+        pass
+
+    result = c.fn(**casted)
+    if inspect.iscoroutine(result):
+        if not run or _loop_running():
+            return _remember_awaited(result, key, function, policy, now)
+        result = _run(result)
+    _remember(key, function, policy, now, result)
+    return result
+
+
+def clear() -> None:
+    """
+    Drop every cached result.
+    """
+    with _connect() as db:
+        db.execute('DELETE FROM results')
@@ -0,0 +1,51 @@
+"""
+Client for `water_cli.daemon` servers.
+
+Only the standard library is imported here, so the client starts as fast as the
+interpreter does; it can also be run directly as a script, without water installed.
+
+    python -m water_cli.client /path/to/socket ARGS...
+"""
+import json
+import os
+import socket
+import sys
+
+from typing import List, Optional, Tuple
+
+
+def call(path: str, argv: List[str], cwd: Optional[str] = None) -> Tuple[str, str, int]:
+    """
+    Run `argv` on the server listening on `path`, returning its stdout, stderr and exit code.
+
+    Raises `ConnectionError` if the server closes the connection without answering.
+    """
+    request = {'argv': argv, 'cwd': cwd if cwd is not None else os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with s.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f'The server on {path} closed the connection without a response')
+    response = json.loads(line)
+    return response['stdout'], response['stderr'], response['code']
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print('Usage: python -m water_cli.client SOCKET [ARGS...]', file=sys.stderr)
+        sys.exit(2)
+    try:
+        stdout, stderr, code = call(args[0], args[1:])
+    except OSError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
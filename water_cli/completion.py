@@ -0,0 +1,197 @@
+"""
+Shell completion for bash, zsh and fish, backed by a static index.
+
+Reflecting over a tree on every key press is too slow for completion, so the tree is
+written once to an index file, with one `path<TAB>candidate` line per completion:
+
+    <TAB>remote                 top level commands and namespaces
+    remote<TAB>add
+    remote add<TAB>--name       parameters of a command
+    paint --color<TAB>red       choices of an Enum parameter
+
+The completion scripts look candidates up with `awk`, so completing never starts a
+Python interpreter. The index starts with one `#file<TAB>path` line per source file
+of the tree; the scripts run `PROGRAM --completion-index` to rebuild it when any of
+those is newer than the index.
+
+Print a script with `tool --completion bash|zsh|fish` (see `simple_cli`), e.g. by adding
+`eval "$(tool --completion bash)"` to `~/.bashrc`.
+"""
+import hashlib
+import os
+import sys
+
+from typing import Any, Dict, Iterator, List
+
+from water_cli.parser import Namespace
+from water_cli.snapshot import cache_dir, dump
+
+SHELLS = ('bash', 'zsh', 'fish')
+
+
+def _choices(annotation: Dict[str, Any]) -> Iterator[str]:
+    if annotation['type'] == 'enum':
+        yield from annotation['choices']
+    for arg in annotation.get('args', []):
+        yield from _choices(arg)
+
+
+def _entries(node: Dict[str, Any], path: List[str]) -> Iterator[str]:
+    key = ' '.join(path)
+    for name in node['options']:
+        yield f'{key}\t{name}'
+    for member in node['members']:
+        yield from _entries(member, path + [member['name']])
+    for c in node['callables']:
+        command = ' '.join(path + [c['name']])
+        for arg in c['args']:
+            yield f'{command}\t--{arg["name"]}'
+            for choice in dict.fromkeys(_choices(arg['annotation'])):
+                yield f'{command} --{arg["name"]}\t{choice}'
+
+
+def build_index(ns: Namespace) -> List[str]:
+    """
+    The lines of the completion index of the (eagerly reflected) tree `ns`.
+    """
+    snapshot = dump(ns)
+    files = sorted(set(snapshot['files']) | {os.path.abspath(sys.argv[0])})
+    return [f'#file\t{path}' for path in files] + list(_entries(snapshot['tree'], []))
+
+
+def index_path(program: str) -> str:
+    """
+    Where the completion index of the script at `program` is stored.
+    """
+    digest = hashlib.sha256(os.path.abspath(program).encode()).hexdigest()[:32]
+    return os.path.join(cache_dir(), 'completion', digest + '.tsv')
+
+
+def write_index(ns: Namespace, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.writelines(line + '\n' for line in build_index(ns))
+    os.replace(tmp, path)
+
+
+_BASH = r'''
+_water_complete_{ident}() {{
+    local index={index} key='' prev candidates w i
+    if [[ ! -f $index ]]; then
+        "${{COMP_WORDS[0]}}" --completion-index >/dev/null 2>&1
+    else
+        while IFS=$'\t' read -r w i; do
+            [[ $w == '#file' ]] || break
+            if [[ $i -nt $index ]]; then
+                "${{COMP_WORDS[0]}}" --completion-index >/dev/null 2>&1
+                break
+            fi
+        done < "$index"
+    fi
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        w=${{COMP_WORDS[i]}}
+        [[ $w == --* ]] && break
+        key="${{key:+$key }}$w"
+    done
+    prev=${{COMP_WORDS[COMP_CWORD-1]}}
+    if [[ $prev == --* ]]; then
+        candidates=$(awk -F'\t' -v k="$key $prev" '$1 == k {{ print $2 }}' "$index" 2>/dev/null)
+    fi
+    if [[ -z $candidates ]]; then
+        candidates=$(awk -F'\t' -v k="$key" '$1 == k {{ print $2 }}' "$index" 2>/dev/null)
+    fi
+    COMPREPLY=($(compgen -W "$candidates" -- "${{COMP_WORDS[COMP_CWORD]}}"))
+}}
+complete -F _water_complete_{ident} {name}
+'''
+
+_ZSH = r'''
+_water_complete_{ident}() {{
+    local index={index} key='' prev w f
+    local -a files candidates
+    if [[ ! -f $index ]]; then
+        "${{words[1]}}" --completion-index >/dev/null 2>&1
+    else
+        files=(${{(f)"$(awk -F'\t' '$1 != "#file" {{ exit }} {{ print $2 }}' "$index")"}})
+        for f in $files; do
+            if [[ $f -nt $index ]]; then
+                "${{words[1]}}" --completion-index >/dev/null 2>&1
+                break
+            fi
+        done
+    fi
+    for w in ${{words[2,CURRENT-1]}}; do
+        [[ $w == --* ]] && break
+        key="${{key:+$key }}$w"
+    done
+    prev=${{words[CURRENT-1]}}
+    if [[ $prev == --* ]]; then
+        candidates=(${{(f)"$(awk -F'\t' -v k="$key $prev" '$1 == k {{ print $2 }}' "$index" 2>/dev/null)"}})
+    fi
+    if (( ! ${{#candidates}} )); then
+        candidates=(${{(f)"$(awk -F'\t' -v k="$key" '$1 == k {{ print $2 }}' "$index" 2>/dev/null)"}})
+    fi
+    compadd -a candidates
+}}
+compdef _water_complete_{ident} {name}
+'''
+
+_FISH = r'''
+function __water_complete_{ident}
+    set -l index {index}
+    set -l tokens (commandline -opc)
+    if not test -f $index
+        $tokens[1] --completion-index >/dev/null 2>&1
+    else if test (count (command find (awk -F'\t' '$1 != "#file" {{ exit }} {{ print $2 }}' $index) -newer $index 2>/dev/null)) -gt 0
+        $tokens[1] --completion-index >/dev/null 2>&1
+    end
+    set -l key
+    for w in $tokens[2..-1]
+        string match -q -- '--*' $w; and break
+        set -a key $w
+    end
+    set -l candidates
+    if string match -q -- '--*' $tokens[-1]
+        set candidates (awk -F'\t' -v k="$key $tokens[-1]" '$1 == k {{ print $2 }}' $index 2>/dev/null)
+    end
+    if test (count $candidates) -eq 0
+        set candidates (awk -F'\t' -v k="$key" '$1 == k {{ print $2 }}' $index 2>/dev/null)
+    end
+    printf '%s\n' $candidates
+end
+complete -c {name} -f -a '(__water_complete_{ident})'
+'''
+
+_SCRIPTS = dict(zip(SHELLS, (_BASH, _ZSH, _FISH)))
+
+
+def script(shell: str, name: str, index: str) -> str:
+    """
+    The completion script for `shell`, completing the command `name` from the index at `index`.
+    """
+    if shell not in _SCRIPTS:
+        raise ValueError(f"Unknown shell '{shell}', expected one of {', '.join(SHELLS)}")
+    ident = ''.join(ch if ch.isalnum() else '_' for ch in name)
+    if shell == 'fish':
+        quoted = "'" + index.replace('\\', '\\\\').replace("'", "\\'") + "'"
+    else:
+        quoted = "'" + index.replace("'", "'\\''") + "'"
+    return _SCRIPTS[shell].format(ident=ident, index=quoted, name=name).lstrip()
+
+
+def completion_cli(c: Any, args: List[str]) -> None:
+    """
+    `--completion SHELL` prints the completion script for the running program, and
+    `--completion-index` rebuilds its index; both write the index.
+    """
+    ns = c if isinstance(c, Namespace) else Namespace.from_callable(c)
+    path = index_path(sys.argv[0])
+    if args[0] == '--completion-index':
+        write_index(ns, path)
+        return
+    if len(args) != 2 or args[1] not in SHELLS:
+        print(f'--completion takes the name of a shell: {", ".join(SHELLS)}')
+        return
+    write_index(ns, path)
+    print(script(args[1], os.path.basename(sys.argv[0]), path), end='')
@@ -0,0 +1,139 @@
+"""
+Serve a CLI from a long-lived process over a Unix domain socket.
+
+The server keeps the compiled tree (and the modules it was built from) loaded, so
+each command only pays for a socket round trip instead of interpreter start-up and
+imports. Every request is one line of JSON, `{"argv": [...], "cwd": "..."}`, and is
+answered with one line of JSON, `{"stdout": "...", "stderr": "...", "code": 0}`; requests
+which can't be run (malformed JSON, a `cwd` which doesn't exist) are answered with code 1.
+
+Start a server with `python tool.py --serve /path/to/socket` (see `simple_cli`) and
+run commands through it with `python -m water_cli.client /path/to/socket ARGS...`
+(see `water_cli.client`). Requests are served one at a time; stdin is not forwarded.
+"""
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, List, Tuple
+
+from water_cli.parser import Namespace, compile
+from water_cli.utils import run_cli
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def run_captured(tree: Namespace, argv: List[str]) -> Tuple[str, str, int]:
+    """
+    Run `argv` like `simple_cli` would, returning its stdout, stderr and exit code.
+
+    Stdin is not forwarded: commands reading it (streams without a value) see it empty,
+    and `--batch -` is refused, rather than reading the stdin of the server.
+    """
+    if argv[:2] == ['--batch', '-']:
+        return '', '--batch - reads stdin, which is not forwarded to served commands; pass a file\n', 1
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    code = 0
+    stdin, sys.stdin = sys.stdin, io.StringIO()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                run_cli(tree, argv)
+            except SystemExit as e:
+                code = _exit_code(e)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        sys.stdin = stdin
+    return stdout.getvalue(), stderr.getvalue(), code
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: 'Server'
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line.strip():
+            return  # a connection closed without a request, like the probe of `_remove_stale_socket`
+        try:
+            stdout, stderr, code = self._run(json.loads(line))
+        except (ValueError, OSError) as e:
+            stdout, stderr, code = '', f'Bad request: {e}\n', 1
+        response = {'stdout': stdout, 'stderr': stderr, 'code': code}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+    def _run(self, request: Any) -> Tuple[str, str, int]:
+        argv = request.get('argv') if isinstance(request, dict) else None
+        if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+            raise ValueError("expected an object with 'argv', a list of strings")
+        cwd = os.getcwd()
+        target = request.get('cwd', cwd)
+        if not isinstance(target, str):
+            raise ValueError("'cwd' must be a string")
+        os.chdir(target)
+        try:
+            return run_captured(self.server.tree, argv)
+        finally:
+            os.chdir(cwd)
+
+
+class Server(socketserver.UnixStreamServer):
+    def __init__(self, tree: Namespace, path: str):
+        self.tree = tree
+        self.path = path
+        _remove_stale_socket(path)
+        umask = os.umask(0o077)  # only the owner may connect
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _remove_stale_socket(path: str) -> None:
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f'Another server is already listening on {path}')
+
+
+def make_server(c: Any, path: str) -> Server:
+    """
+    Compile `c` and bind a server for it to `path`; call `serve_forever` to start serving.
+    """
+    tree = c if isinstance(c, Namespace) else compile(c, lazy=True, reuse_instances=True)
+    return Server(tree, path)
+
+
+def serve_cli(c: Any, args: List[str]) -> None:
+    if len(args) != 1:
+        print('--serve takes a single argument: the path of the socket to listen on')
+        return
+    with make_server(c, args[0]) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -1,7 +1,15 @@
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 class BadArguments(ValueError):
-    pass
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # subclasses take different constructor arguments, so restore their attributes directly
+        return (_restore, (type(self), self.args, self.__dict__))
+
+def _restore(cls: Type[BadArguments], args: Tuple[Any, ...], state: Dict[str, Any]) -> BadArguments:
+    e = cls.__new__(cls, *args)
+    e.args = args
+    e.__dict__.update(state)
+    return e
 
 class InvalidChoice(BadArguments):
     def __init__(self, argument: str, value: str, valid_options: List[str]):
@@ -13,10 +21,12 @@ class InvalidChoice(BadArguments):
         return f"Allowed values are {', '.join(self.valid_options)}."
 
 class BadSubcommand(BadArguments):
-    def __init__(self, parent: List[str], attempted: str, valid_options: List[str]):
+    def __init__(self, parent: List[str], attempted: str, valid_options: List[str],
+                 suggestions: Optional[List[str]] = None):
         self.parent = parent
         self.attempted = attempted
         self.valid_options = valid_options
+        self.suggestions = suggestions or []  # the closest valid options, nearest first
 
     def __str__(self) -> str:
         if len(self.parent) > 1:
@@ -44,8 +54,9 @@ class UnexpectedValue(BadArguments):
         return f"Expected a parameter (--parameter) but got a value: {self.value}. Did you mean --{self.value}?"
 
 class UnexpectedParameters(BadArguments):
-    def __init__(self, params: List[str]):
+    def __init__(self, params: List[str], suggestions: Optional[Dict[str, List[str]]] = None):
         self.params = params
+        self.suggestions = suggestions or {}  # the closest accepted parameters to each of `params`
     def __str__(self) -> str:
         _params = [f'--{p}' for p in self.params]
         return f"Unexpected parameters: {', '.join(_params)}"
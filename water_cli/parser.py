@@ -1,20 +1,51 @@
 import enum
+import importlib
 import inspect
-import re
-import shlex
+import os
+import sys
+import time
 
-from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Iterator as AbcIterator, Mapping
+from dataclasses import dataclass, field, replace
 from water_cli.exceptions import (BadArguments, BadSubcommand, UnexpectedParameters, MissingParameters,
                                   ConsecutiveValues, UnexpectedValue, MissingValues, IncorrectType,
-                                  InvalidChoice,
+                                  InvalidChoice, ExclusiveFlags, MissingRequiredCombination,
                                   )
-from typing import List, Callable, Any, Tuple, Optional, Union, Dict, TypeVar
+from itertools import islice
+from typing import (List, Callable, Any, Tuple, Optional, Union, Dict, TypeVar, Iterable, Iterator, Sequence,
+                    FrozenSet, Generic, Pattern, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from water_cli.cache import CachePolicy
+    from water_cli.suggestions import SuggestionIndex
 
 T = TypeVar('T')
+Converter = Callable[[Any], Any]
 
 class Repeated(List[T]):
     pass
 
+class Stream(Iterator[T]):
+    """
+    An argument read lazily, one line at a time, from stdin (`-`) or a file (`@path`).
+
+    Lines are converted to `T` as they are consumed. Streams without a default read
+    stdin when they are not passed.
+    """
+
+class Packed(Generic[T]):
+    """
+    Wraps `List[int]`, `List[float]`, `Repeated[int]` or `Repeated[float]` so the argument
+    is converted, in bulk, to a compact `array.array` (of `'q'` or `'d'`) instead of a list.
+    """
+
+class MappedFile:
+    """
+    An argument naming a file whose contents are passed, mapped read-only into memory,
+    as a `memoryview`; nothing is copied, and pages are only read once they are accessed.
+    """
+
 class Flag:
     def __init__(self, checked: bool) -> None:
         self.checked = checked
@@ -28,21 +59,209 @@ def typing_get_args(a: Any) -> List[Any]:
 def typing_get_origin(a: Any) -> Any:
     return getattr(a, '__origin__', a)
 
+def is_stream(a: Any) -> bool:
+    return typing_get_origin(a) in (Stream, AbcIterator)
+
+def unpacked(a: Any) -> Any:
+    """
+    The annotation wrapped by `Packed`, or `a` itself.
+    """
+    if typing_get_origin(a) is Packed and typing_get_args(a):
+        return typing_get_args(a)[0]
+    return a
+
+
+# ('exclusive' or 'together', parameter names)
+Check = Tuple[str, Tuple[str, ...]]
+
+
+@dataclass(frozen=True)
+class Constraints:
+    """
+    Combinations of parameters attached to `wrapper` by `water_cli.utils.exclusive_flags`
+    and `required_together`, outermost decorator first.
+
+    They are checked while parsing, before any value is cast, so dispatching calls `target`
+    (the undecorated function) rather than `wrapper`, which would check them again.
+    """
+    wrapper: Callable[..., Any]
+    target: Callable[..., Any]
+    checks: Tuple[Check, ...]
+
+def constraints_of(fn: Any) -> Optional[Constraints]:
+    """
+    The `Constraints` attached to `fn` (a function or a bound method), if any.
+    """
+    func = getattr(fn, '__func__', fn)
+    constraints = getattr(func, '__water_constraints__', None)
+    # `functools.wraps` copies the attribute to other decorators, which must still be called
+    if not isinstance(constraints, Constraints) or constraints.wrapper is not func:
+        return None
+    if func is not fn:
+        owner = fn.__self__
+        return replace(constraints, wrapper=fn, target=constraints.target.__get__(owner, type(owner)))
+    return constraints
+
+
+@dataclass(frozen=True)
+class ParseSpec:
+    """
+    What `_parse` needs to know about the arguments of a callable, by argument name.
+    """
+    flags: Tuple[str, ...]
+    repeated: Tuple[str, ...]
+    accepted: FrozenSet[str]
+    required: FrozenSet[str]
+    stdin: Tuple[str, ...]  # streams which read stdin when not passed
+    bits: Dict[str, int]  # a bit per argument, for `checks`
+    checks: Tuple[Tuple[bool, int, Tuple[str, ...]], ...]  # (exclusive, mask of the names, names)
+
 
 @dataclass
 class MCallable:
     name: str
     args: List[inspect.Parameter]
-    fn: Callable[..., Any]
+    target: Callable[..., Any]
     parent: Optional['Namespace']
+    bind: bool = False
+    constraints: Tuple[Check, ...] = ()
+    cache: Optional['CachePolicy'] = None  # see `water_cli.cache.cached`
+    _plan: Optional[Dict[str, Tuple[Converter, str]]] = field(default=None, init=False, repr=False, compare=False)
+    _spec: Optional[ParseSpec] = field(default=None, init=False, repr=False, compare=False)
+    _suggestions: Optional['SuggestionIndex'] = field(default=None, init=False, repr=False, compare=False)
 
     @staticmethod
-    def from_callable(callable_root: Callable[..., Any], name: str, parent: Optional['Namespace']) -> 'MCallable':
+    def from_callable(callable_root: Callable[..., Any], name: str, parent: Optional['Namespace'],
+                      bind: bool=False) -> 'MCallable':
         s = inspect.signature(callable_root)
+        args = list(s.parameters.values())
+        if bind:
+            args = args[1:]  # 'self' is provided when binding
+        constraints = constraints_of(callable_root)
         return MCallable(name=name,
-                         args=list(s.parameters.values()),
-                         fn=callable_root,
-                         parent=parent)
+                         args=args,
+                         target=callable_root if constraints is None else constraints.target,
+                         parent=parent,
+                         bind=bind,
+                         constraints=() if constraints is None else constraints.checks,
+                         # read from the callable as reflected, as `cached` may be above or below
+                         # the decorators `constraints` skip
+                         cache=getattr(callable_root, '__water_cache__', None))
+
+    @property
+    def fn(self) -> Callable[..., Any]:
+        """
+        The callable to dispatch to.
+
+        Methods are reflected over on their class; they are bound to an instance of it
+        (see `Namespace.instance`) only when accessed here.
+        """
+        if not self.bind:
+            return self.target
+        assert self.parent is not None
+        instance = self.parent.instance()
+        return self.target.__get__(instance, type(instance))  # type: ignore[no-any-return]
+
+    def parse_spec(self) -> ParseSpec:
+        """
+        Argument names grouped by how `_parse` treats them; computed on first use.
+        """
+        if self._spec is None:
+            stdin = tuple(a.name for a in self.args
+                          if is_stream(a.annotation) and a.default is inspect.Parameter.empty)
+            bits = {a.name: 1 << i for i, a in enumerate(self.args)}
+            self._spec = ParseSpec(
+                flags=tuple(a.name for a in self.args if a.annotation == Flag),
+                repeated=tuple(a.name for a in self.args if typing_get_origin(unpacked(a.annotation)) == Repeated),
+                accepted=frozenset(a.name for a in self.args),
+                required=frozenset(a.name for a in self.args
+                                   if a.default is inspect.Parameter.empty and a.name not in stdin),
+                stdin=stdin,
+                bits=bits,
+                checks=tuple((kind == 'exclusive', sum(bits[n] for n in names), names)
+                             for kind, names in self.constraints),
+            )
+        return self._spec
+
+    def suggest(self, name: str) -> List[str]:
+        """
+        The parameters `name` is most likely a typo of; see `water_cli.suggestions`.
+        """
+        if self._suggestions is None:
+            from water_cli.suggestions import SuggestionIndex
+            self._suggestions = SuggestionIndex(a.name for a in self.args)
+        return self._suggestions.suggest(name)
+
+    def cast_plan(self) -> Dict[str, Tuple[Converter, str]]:
+        """
+        Converter and type name for every argument, keyed by argument name.
+
+        Compiled (see `compile_cast`) on first use and kept for the lifetime of the tree.
+        """
+        if self._plan is None:
+            self._plan = {}
+            for a in self.args:
+                # errors name the type the value is written as, not the `Packed` wrapper
+                annotation = unpacked(a.annotation)
+                _typename = getattr(annotation, '__name__', str(annotation))
+                self._plan[a.name] = (compile_cast(a.name, a.annotation), _typename)
+        return self._plan
+
+
+def _is_member(value: Any, in_module: bool) -> bool:
+    return inspect.isclass(value) or (not in_module and inspect.ismodule(value))
+
+def _is_method(value: Any) -> bool:
+    return inspect.ismethod(value) or inspect.isfunction(value)
+
+def import_string(path: str) -> Any:
+    """
+    Import the object at `path`, written as 'package.module' or 'package.module:Attr.Sub'.
+    """
+    module_name, _, attrs = path.partition(':')
+    obj = importlib.import_module(module_name)
+    for attr in filter(None, attrs.split('.')):
+        obj = getattr(obj, attr)
+    return obj
+
+def _method(ns: 'Namespace', name: str, value: Callable[..., Any]) -> MCallable:
+    # plain functions on a class need an instance; static and class methods do not
+    bind = (inspect.isclass(ns.source) and inspect.isfunction(value)
+            and not isinstance(inspect.getattr_static(ns.source, name), staticmethod))
+    return MCallable.from_callable(value, name, parent=ns, bind=bind)
+
+def _instance_member(ns: 'Namespace', name: str, lazy: bool) -> Optional[Union['Namespace', MCallable]]:
+    # groups and commands assigned in `__init__` are attributes of instances, not of the
+    # class; they are looked up (constructing the class) only when the class has no `name`
+    source = ns.source
+    if not inspect.isclass(source) or source.__init__ is object.__init__ or name.startswith('_'):
+        return None
+    value: Any = getattr(ns.instance(), name, None)
+    if _is_member(value, in_module=False):
+        return Namespace.from_callable(value, name, parent=ns, lazy=lazy, reuse_instances=ns.reuse_instances,
+                                       abbreviations=ns.abbreviations)
+    if _is_method(value):
+        return MCallable.from_callable(value, name, parent=ns)
+    return None
+
+def _mapping_entry(ns: 'Namespace', name: str, value: Any, lazy: bool) -> Union['Namespace', MCallable]:
+    if isinstance(value, str):
+        value = import_string(value)
+    if _is_method(value):
+        return MCallable.from_callable(value, name, parent=ns)
+    return Namespace.from_callable(value, name, parent=ns, lazy=lazy, reuse_instances=ns.reuse_instances,
+                                   abbreviations=ns.abbreviations)
+
+def _unique_prefixes(names: Iterable[str]) -> Dict[str, str]:
+    """
+    Map every proper prefix of `names` which starts exactly one of them to that name.
+    """
+    owners: Dict[str, Optional[str]] = {}
+    for name in dict.fromkeys(names):
+        for end in range(1, len(name)):
+            prefix = name[:end]
+            owners[prefix] = None if prefix in owners else name  # None: ambiguous
+    return {prefix: name for prefix, name in owners.items() if name is not None}
 
 
 @dataclass
@@ -51,192 +270,740 @@ class Namespace:
     members: List['Namespace']
     callables: List[MCallable]
     parent: Optional['Namespace'] = None
+    source: Any = None
+    reuse_instances: bool = False
+    abbreviations: bool = False
+    _instance: Any = field(default=None, init=False, repr=False, compare=False)
+    _by_name: Optional[Dict[str, Union['Namespace', MCallable]]] = field(default=None, init=False, repr=False,
+                                                                          compare=False)
+    _prefixes: Optional[Dict[str, str]] = field(default=None, init=False, repr=False, compare=False)
+    _suggestions: Optional['SuggestionIndex'] = field(default=None, init=False, repr=False, compare=False)
 
     @staticmethod
-    def from_callable(callable_root: Callable[..., Any], name: Optional[str]=None, parent: Optional['Namespace']=None) -> 'Namespace':
+    def from_callable(callable_root: Any, name: Optional[str]=None, parent: Optional['Namespace']=None,
+                      lazy: bool=False, reuse_instances: bool=False, abbreviations: bool=False) -> 'Namespace':
+        """
+        Reflect over `callable_root`, which may be a function, a class, a module, an instance
+        or a mapping of command names to any of those.
+
+        Classes are not instantiated while building the tree; see `instance`.
+
+        Strings, either as `callable_root` or as mapping values, are import paths
+        (see `import_string`); in lazy trees they are only imported when dispatched into.
+
+        With `abbreviations`, `find` also accepts any prefix which starts a single name.
+        """
+        if isinstance(callable_root, str):
+            callable_root = import_string(callable_root)
         if not name:
-            name = callable_root.__name__
+            name = str(getattr(callable_root, '__name__', type(callable_root).__name__))
         if inspect.isfunction(callable_root):
-            return Namespace(name, members=[], callables=[MCallable.from_callable(callable_root, name, parent=None)])
-        if inspect.isclass(callable_root):
-            callable_root = callable_root()
+            return Namespace(name, members=[], callables=[MCallable.from_callable(callable_root, name, parent=None)],
+                             abbreviations=abbreviations)
+        if lazy:
+            return LazyNamespace(name, callable_root, parent=parent, reuse_instances=reuse_instances,
+                                 abbreviations=abbreviations)
+
+        if isinstance(callable_root, Mapping):
+            ns = Namespace(name=name, members=[], callables=[], parent=parent, source=callable_root,
+                           reuse_instances=reuse_instances, abbreviations=abbreviations)
+            for key, value in callable_root.items():
+                entry = _mapping_entry(ns, key, value, lazy=False)
+                if isinstance(entry, Namespace):
+                    ns.members.append(entry)
+                else:
+                    ns.callables.append(entry)
+            return ns
 
         _is_mod = inspect.ismodule(callable_root)
 
-        _members = inspect.getmembers(callable_root, lambda x: inspect.isclass(x) or (not _is_mod and inspect.ismodule(x)))
-        _methods = inspect.getmembers(callable_root, lambda x: inspect.ismethod(x) or inspect.isfunction(x))
+        _members = inspect.getmembers(callable_root, lambda x: _is_member(x, _is_mod))
+        _methods = inspect.getmembers(callable_root, _is_method)
 
-        ns = Namespace(name=name, members=[], callables=[], parent=parent)
+        ns = Namespace(name=name, members=[], callables=[], parent=parent, source=callable_root,
+                       reuse_instances=reuse_instances, abbreviations=abbreviations)
 
-        members = [Namespace.from_callable(_type, name, parent=ns) for name, _type in _members if not name.startswith('_')]
-        methods = [MCallable.from_callable(_type, name, parent=ns) for name, _type in _methods]
+        members = [Namespace.from_callable(_type, name, parent=ns, reuse_instances=reuse_instances,
+                                           abbreviations=abbreviations)
+                   for name, _type in _members if not name.startswith('_')]
+        methods = [_method(ns, name, _type) for name, _type in _methods]
 
         ns.members = members
         ns.callables = methods
 
         return ns
 
+    def find(self, name: str) -> Optional[Union['Namespace', MCallable]]:
+        """
+        Return the member or callable called `name`; members take precedence. Names
+        which are not attributes of a class are looked up on an instance of it (see
+        `instance`), for groups and commands assigned in `__init__`.
+
+        The names are indexed the first time, so every later lookup is a single dict
+        access and resolving a command costs one lookup per token. With `abbreviations`
+        a name which is not found is expanded with `expand`.
+        """
+        if self._by_name is None:
+            by_name: Dict[str, Union[Namespace, MCallable]] = {c.name: c for c in self.callables}
+            by_name.update((m.name, m) for m in self.members)
+            self._by_name = by_name
+        found = self._by_name.get(name)
+        if found is None:
+            found = _instance_member(self, name, lazy=False)
+            if found is not None:
+                self._by_name[name] = found
+        if found is None and self.abbreviations:
+            full = self.expand(name)
+            if full is not None:
+                found = self._by_name.get(full)
+        return found
+
+    def expand(self, prefix: str) -> Optional[str]:
+        """
+        The only name in `option_names` which starts with `prefix`, if there is exactly one.
+        """
+        if self._prefixes is None:
+            self._prefixes = _unique_prefixes(self.option_names())
+        return self._prefixes.get(prefix)
+
+    def suggest(self, name: str) -> List[str]:
+        """
+        The names in `option_names` which `name` is most likely a typo of; see `water_cli.suggestions`.
+
+        The index is built the first time, so later lookups stay fast however many names there are.
+        """
+        if self._suggestions is None:
+            from water_cli.suggestions import SuggestionIndex
+            self._suggestions = SuggestionIndex(self.option_names())
+        return self._suggestions.suggest(name)
+
+    def option_names(self) -> List[str]:
+        """
+        Names which can be dispatched to from this namespace: callables, then members.
+
+        Mapping namespaces list their keys in order, without resolving them.
+        """
+        if isinstance(self.source, Mapping):
+            return list(self.source)
+        return [c.name for c in self.callables] + [m.name for m in self.members]
+
+    def instance(self) -> Any:
+        """
+        The object methods of this namespace are bound to.
+
+        Class namespaces construct a new instance on every call, unless the tree was
+        built with `reuse_instances`, in which case the first instance is kept.
+        """
+        if not inspect.isclass(self.source):
+            return self.source
+        if not self.reuse_instances:
+            return self.source()
+        if self._instance is None:
+            self._instance = self.source()
+        return self._instance
+
+
+class LazyNamespace(Namespace):
+    """
+    A `Namespace` which reflects over its source one attribute at a time.
 
-def args_to_kwargs(args: List[str]) -> List[Tuple[str, Any]]:
-    kwargs: List[Tuple[str, Optional[str]]] = []
+    `find` only looks up the requested name, so dispatching `a b c` introspects three
+    attributes regardless of how big the tree is. Listing `members` or `callables`
+    reflects over the whole level (but not its children) and is only needed for
+    error reporting.
+    """
+    def __init__(self, name: str, source: Any, parent: Optional[Namespace]=None, reuse_instances: bool=False,
+                 abbreviations: bool=False):
+        self.name = name
+        self.parent = parent
+        self.source = source
+        self.reuse_instances = reuse_instances
+        self.abbreviations = abbreviations
+        self._instance = None
+        self._by_name = None
+        self._prefixes = None
+        self._suggestions = None
+        self._in_module = inspect.ismodule(source)
+        self._found: Dict[str, Optional[Union[Namespace, MCallable]]] = {}
+        self._members: Optional[List[Namespace]] = None
+        self._callables: Optional[List[MCallable]] = None
+
+    def _member_names(self) -> List[str]:
+        if isinstance(self.source, Mapping):
+            return list(self.source)
+        return [n for n, _ in inspect.getmembers(self.source, lambda x: _is_member(x, self._in_module))
+                if not n.startswith('_')]
+
+    def _callable_names(self) -> List[str]:
+        if isinstance(self.source, Mapping):
+            return list(self.source)
+        return [n for n, _ in inspect.getmembers(self.source, _is_method)]
+
+    @property  # type: ignore[override]
+    def members(self) -> List[Namespace]:
+        if self._members is None:
+            self._members = [m for m in map(self.find, self._member_names()) if isinstance(m, Namespace)]
+        return self._members
+
+    @members.setter
+    def members(self, value: List[Namespace]) -> None:
+        self._members = value
+
+    @property  # type: ignore[override]
+    def callables(self) -> List[MCallable]:
+        if self._callables is None:
+            self._callables = [c for c in map(self.find, self._callable_names()) if isinstance(c, MCallable)]
+        return self._callables
+
+    @callables.setter
+    def callables(self, value: List[MCallable]) -> None:
+        self._callables = value
+
+    def find(self, name: str) -> Optional[Union[Namespace, MCallable]]:
+        if name in self._found:
+            return self._found[name]
+
+        found: Optional[Union[Namespace, MCallable]] = None
+        if isinstance(self.source, Mapping):
+            if name in self.source:
+                found = _mapping_entry(self, name, self.source[name], lazy=True)
+        else:
+            value: Any = getattr(self.source, name, None)
+            if _is_member(value, self._in_module) and not name.startswith('_'):
+                found = Namespace.from_callable(value, name, parent=self, lazy=True,
+                                                reuse_instances=self.reuse_instances,
+                                                abbreviations=self.abbreviations)
+            elif _is_method(value):
+                found = _method(self, name, value)
+            else:
+                found = _instance_member(self, name, lazy=True)
+        if found is None and self.abbreviations:
+            # only a miss lists the level, to see which names the prefix could stand for
+            full = self.expand(name)
+            if full is not None:
+                found = self.find(full)
+
+        self._found[name] = found
+        return found
+
+
+_WITH_EQUAL: Optional[Pattern[str]] = None
+
+
+def _with_equal() -> Pattern[str]:
+    # compiled on first use, so importing the parser doesn't pay for it
+    global _WITH_EQUAL
+    if _WITH_EQUAL is None:
+        import re
+        _WITH_EQUAL = re.compile(r'(?P<flag>--[a-z0-9-_]+)=(?P<value>.+)')
+    return _WITH_EQUAL
+
+_MAX_RESPONSE_FILE_DEPTH = 16
+
+def _response_file(path: str) -> Iterator[str]:
+    try:
+        f = open(path)
+    except OSError as e:
+        raise BadArguments(f"Unable to read response file '{path}': {e}")
+    return (line for line in _lines(f, close=True) if line)
+
+def args_to_kwargs(args: Iterable[str], repeated: Sequence[str]=()) -> List[Tuple[str, Any]]:
+    """
+    Pair up `--key value`, `--key=value` and bare `--key` tokens, in a single pass.
+
+    Values for keys in `repeated` are grouped into one list per key, which is placed
+    after every other pair, in the order of `repeated`.
+
+    An `@path` token where a key is expected is a response file: its lines are read as
+    tokens, one per line, in its place. This keeps huge argument lists out of `argv`.
+    """
+    kwargs: List[Tuple[str, Any]] = []
+    groups: Dict[str, List[Any]] = {k: [] for k in repeated}
+    # where the most recent occurrence of every key was stored, so a value can be assigned to it
+    latest: Dict[str, Tuple[List[Any], int]] = {}
+
+    def _add(k: str, v: Optional[str]) -> None:
+        group = groups.get(k)
+        if group is None:
+            latest[k] = (kwargs, len(kwargs))
+            kwargs.append((k, v))
+        else:
+            latest[k] = (group, len(group))
+            group.append(v)
 
-    i = 0
     last_key = None
     last_value = None
     current_key = None
-    while i < len(args):
-        arg = args[i]
-        if not arg.startswith('--') and current_key is None:
-            if last_key and last_value:
-                raise ConsecutiveValues(last_key, last_value, arg)
-            raise UnexpectedValue(arg)
-
-        with_equal = re.match(r'(?P<flag>--[a-z0-9-_]+)=(?P<value>.+)', arg)
-        if with_equal:
-            k = str(with_equal.group('flag'))
-            v = str(with_equal.group('value'))
-            k = k[2:]  # '--a' -> 'a'
-            k = k.replace('-', '_')  # '--a-thing' -> 'a_thing'
-            kwargs.append((k, v))
-            last_key = k
-            last_value = v
-        elif arg.startswith('--'):
-            k = arg
-            k = k[2:]  # '--a' -> 'a'
-            k = k.replace('-', '_')  # '--a-thing' -> 'a_thing'
-            kwargs.append((k, None))  # This enables 'flags' with no value
-            current_key = k
-            last_key = k
-        else:
-            for idx, (_key, _) in reversed(list(enumerate(kwargs))):
-                if _key == current_key:
-                    kwargs[idx] = (_key, arg)
-                    last_key = _key
-                    last_value = arg
-                    current_key = None
+    # the arguments, and the response files being read, innermost last
+    sources: List[Iterator[str]] = [iter(args)]
+    while sources:
+        for arg in sources[-1]:
+            if arg.startswith('--'):
+                with_equal = _with_equal().match(arg) if '=' in arg else None
+                if with_equal:
+                    k = with_equal.group('flag')[2:]  # '--a' -> 'a'
+                    k = k.replace('-', '_')  # '--a-thing' -> 'a_thing'
+                    v = with_equal.group('value')
+                    _add(k, v)
+                    last_key = k
+                    last_value = v
+                else:
+                    k = arg[2:]  # '--a' -> 'a'
+                    k = k.replace('-', '_')  # '--a-thing' -> 'a_thing'
+                    _add(k, None)  # This enables 'flags' with no value
+                    current_key = k
+                    last_key = k
+            elif current_key is None:
+                if arg.startswith('@') and len(arg) > 1:
+                    if len(sources) > _MAX_RESPONSE_FILE_DEPTH:
+                        raise BadArguments(f"Response files nested more than {_MAX_RESPONSE_FILE_DEPTH} deep")
+                    sources.append(_response_file(arg[1:]))
                     break
-            assert current_key is None, "Somehow could not find what key to assign"
-        i += 1
+                if last_key and last_value:
+                    raise ConsecutiveValues(last_key, last_value, arg)
+                raise UnexpectedValue(arg)
+            else:
+                target, idx = latest[current_key]
+                target[idx] = (current_key, arg) if target is kwargs else arg
+                last_key = current_key
+                last_value = arg
+                current_key = None
+        else:
+            sources.pop()
+
+    for k in repeated:
+        if groups[k]:
+            kwargs.append((k, groups[k]))
     return kwargs
 
 
-def _parse(ns: Namespace, input_tokens: List[str]) -> Tuple[MCallable, Dict[str, Any]]:
-    if len(input_tokens) == 0:
-        raise BadArguments("Received no arguments")
-    command, *args = input_tokens
+def _resolve(ns: Namespace, input_tokens: List[str]) -> Tuple[MCallable, int]:
+    """
+    The callable selected by the leading tokens, and the number of tokens that selected it.
+    """
+    i = 0
+    while True:
+        if len(input_tokens) == i:
+            raise BadArguments("Received no arguments")
+        command = input_tokens[i]
+        i += 1
 
-    _members = {m.name: m for m in ns.members}
-    if command in _members:
-        return _parse(_members[command], args)
+        child = ns.find(command)
+        if not isinstance(child, Namespace):
+            break
+        ns = child
 
-    _callables = {c.name: c for c in ns.callables}
-    if command not in _callables:
+    if child is None:
         hierarchy: List[str] = []
         parent = ns.parent
         while parent:
             hierarchy.insert(0, parent.name)
             parent = parent.parent
 
-        _member_names = [m.name for m in ns.members]
-        raise BadSubcommand(hierarchy + [ns.name], command, list(_callables) + _member_names)
-
-    _callable = _callables[command]
-    kwargs = args_to_kwargs(args)
-    rcvd_params = {key for key, _ in kwargs}
-
-    for a in _callable.args:
-        origin = typing_get_origin(a.annotation)
-        if a.annotation == Flag:
-            if a.name not in rcvd_params:
-                kwargs.append((a.name, Flag(False)))
-                continue
-
-            for idx, (k, _) in enumerate(kwargs):
-                if k == a.name:
-                    kwargs[idx] = (k, Flag(True))
-        elif origin == Repeated:
-            kwargs = _merge(kwargs, a.name)
-
-    missing_values = [k for k, v in kwargs if v is None]
-    if missing_values:
-        raise MissingValues(list(sorted(missing_values)))
-
-    all_params = {a.name for a in _callable.args}
-    rcvd_params = {key for key, _ in kwargs}  # updated with flags
-    needed_params = {a.name for a in _callable.args if a.default is inspect.Parameter.empty}
+        raise BadSubcommand(hierarchy + [ns.name], command, ns.option_names(), ns.suggest(command))
+    return child, i
 
-    missing_params = needed_params - rcvd_params
-    extra_params = rcvd_params - all_params
+def _check_args(_callable: MCallable, kwargs: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate the tokenized `kwargs` against the parameters of `_callable`, filling in flags
+    and streams which were not passed, and check its `constraints` before anything is cast.
+    """
+    spec = _callable.parse_spec()
+    rcvd_params = set()
+    for idx, (k, v) in enumerate(kwargs):
+        rcvd_params.add(k)
+        if k in spec.flags:
+            kwargs[idx] = (k, Flag(True))
+        elif v is None:
+            missing_values = [k for k, v in kwargs if v is None and k not in spec.flags]
+            raise MissingValues(list(sorted(missing_values)))
+
+    for name in spec.flags:
+        if name not in rcvd_params:
+            kwargs.append((name, Flag(False)))
+    rcvd_params.update(spec.flags)
+    for name in spec.stdin:
+        if name not in rcvd_params:
+            kwargs.append((name, '-'))
+
+    missing_params = spec.required - rcvd_params
+    extra_params = rcvd_params - spec.accepted
     if missing_params:
         raise MissingParameters(list(sorted(missing_params)))
     elif extra_params:
-        raise UnexpectedParameters(list(sorted(extra_params)))
-
-    return _callable, dict(kwargs)
-
-def _merge(kwargs: List[Tuple[str, Any]], key: str) -> List[Tuple[str, Any]]:
-    """
-    Merge key-value pairs which have a key matching `key`.
+        raise UnexpectedParameters(list(sorted(extra_params)),
+                                   {name: _callable.suggest(name) for name in sorted(extra_params)})
 
-    >>> _merge([('a', 1), ('b', 2), ('a', 3)])
-    [('b', 2), ('a', [1, 3])]
-    """
-    _buf = []
-    _ret = []
-    for k, v in kwargs:
-        if k != key:
-            _ret.append((k, v))
-            continue
-        _buf.append(v)
+    checked = dict(kwargs)
+    if spec.checks:
+        _check_constraints(spec, checked)
+    return checked
 
-    if _buf:
-        _ret.append((key, _buf))
+def _check_constraints(spec: ParseSpec, kwargs: Dict[str, Any]) -> None:
+    provided = 0
+    for k, v in kwargs.items():
+        if not isinstance(v, Flag) or v.checked:
+            provided |= spec.bits[k]
+    for exclusive, mask, names in spec.checks:
+        present = provided & mask
+        if exclusive and present == mask:
+            raise ExclusiveFlags(names)
+        if not exclusive and present and present != mask:
+            raise MissingRequiredCombination(tuple(n for n in names if provided & spec.bits[n]),
+                                             tuple(n for n in names if not provided & spec.bits[n]))
 
-    return _ret
+def _parse(ns: Namespace, input_tokens: List[str]) -> Tuple[MCallable, Dict[str, Any]]:
+    _callable, i = _resolve(ns, input_tokens)
+    kwargs = args_to_kwargs(islice(input_tokens, i, None), _callable.parse_spec().repeated)
+    return _callable, _check_args(_callable, kwargs)
 
 def parse(ns: Namespace, input_command: str) -> Tuple[MCallable, Dict[str, Any]]:
+    import shlex
     return _parse(ns, shlex.split(input_command))
 
 
-def apply_args(c: MCallable, kwargs: Dict[str, Any]) -> Any:
+def _cast_args(c: MCallable, kwargs: Dict[str, Any]) -> Dict[str, Any]:
     casted = {}
-    args_by_name = {a.name: a for a in c.args}
+    plan = c.cast_plan()
     for k, v in kwargs.items():
+        convert, _typename = plan[k]
         try:
-            casted[k] = cast(k, v, args_by_name[k].annotation)
+            casted[k] = convert(v)
         except Exception as e:
-            a = args_by_name[k].annotation
-            _typename = getattr(a, '__name__', str(a))
             raise IncorrectType(_typename, v, e)
-
+    return casted
+
+def _call_args(c: MCallable, kwargs: Dict[str, Any]) -> Any:
+    # like `apply_args`, but coroutines are returned to the caller to run
+    casted = _cast_args(c, kwargs)
+    if c.cache is not None:
+        from water_cli.cache import call_cached
+        return call_cached(c, casted, c.cache, run=False)
     return c.fn(**casted)
 
-def cast(key: str, value: Any, annotation: Any) -> Any:
+def _loop_running() -> bool:
+    if 'asyncio' not in sys.modules:  # nothing can be running a loop
+        return False
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def _run(res: Any) -> Any:
+    # called from a running event loop, the coroutine is handed back for the caller to await
+    if inspect.iscoroutine(res) and not _loop_running():
+        import asyncio
+        return asyncio.run(res)
+    return res
+
+def _dispatch(c: MCallable, casted: Dict[str, Any]) -> Any:
+    if c.cache is not None:
+        from water_cli.cache import call_cached
+        return call_cached(c, casted, c.cache)
+    return _run(c.fn(**casted))
+
+def apply_args(c: MCallable, kwargs: Dict[str, Any]) -> Any:
+    """
+    Cast `kwargs` and call `c` with them; coroutines (from `async def` commands) are run
+    to completion on a new event loop, or returned to be awaited when an event loop is
+    already running. Commands decorated with `water_cli.cache.cached`
+    may return a stored result instead.
+    """
+    return _dispatch(c, _cast_args(c, kwargs))
+
+_TRUTHY = frozenset(['true', '1', 't', 'y', 'yes'])
+
+def _identity(value: Any) -> Any:
+    return value
+
+def _lines(f: Any, close: bool) -> Iterator[str]:
+    try:
+        for line in f:
+            yield line[:-1] if line.endswith('\n') else line
+    finally:
+        if close:
+            f.close()
+
+def _stream(value: str, item: Converter, typename: str) -> Iterator[Any]:
+    if value == '-':
+        lines = _lines(sys.stdin, close=False)
+    elif value.startswith('@'):
+        lines = _lines(open(value[1:]), close=True)
+    else:
+        raise ValueError("streams are read from '-' (stdin) or '@path' (a file)")
+    if item is _identity:
+        return lines
+    return _convert_lines(lines, item, typename)
+
+def _convert_lines(lines: Iterator[str], item: Converter, typename: str) -> Iterator[Any]:
+    for line in lines:
+        try:
+            yield item(line)
+        except Exception as e:
+            raise IncorrectType(typename, line, e)
+
+def _map_file(path: str) -> memoryview:
+    import mmap
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return memoryview(b'')  # empty files can't be mapped
+        # the mapping stays valid after the file is closed
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+_TYPECODES = {int: 'q', float: 'd'}
+_PACKED_CHUNK = 1 << 16
+
+def _compile_packed(key: str, annotation: Any) -> Converter:
+    import json
+    from array import array
+
     origin = typing_get_origin(annotation)
     args = typing_get_args(annotation)
-    if origin == Union:
-        for arg in args:
+    item = args[0] if len(args) else None
+    if origin not in [list, List, Repeated] or item not in _TYPECODES:
+        message = f'Packed only supports lists of int or float, not {annotation}'
+
+        def _unsupported(value: Any) -> Any:
+            raise TypeError(message)
+        return _unsupported
+
+    typecode = _TYPECODES[item]
+    if origin is Repeated:
+        return lambda value: array(typecode, map(item, value))
+
+    def _chunk(chunk: str) -> 'array[Any]':
+        # JSON numbers are a subset of what int() and float() accept, and are parsed
+        # in C in one call; anything else (including true/false, which array() would
+        # take as 1/0) is converted one element at a time, with the usual errors
+        if chunk and 't' not in chunk and 'f' not in chunk:
             try:
-                value = cast(key, value, arg)
-                break
-            except Exception:
-                continue
+                return array(typecode, json.loads(f'[{chunk}]'))
+            except (ValueError, TypeError):
+                pass
+        return array(typecode, map(item, chunk.split(',')))
+
+    def _packed(value: str) -> 'array[Any]':
+        # a chunk at a time, so the only intermediate list is of one chunk
+        packed = array(typecode)
+        start = 0
+        while True:
+            end = value.find(',', start + _PACKED_CHUNK)
+            if end == -1:
+                packed.extend(_chunk(value[start:]))
+                return packed
+            packed.extend(_chunk(value[start:end]))
+            start = end + 1
+    return _packed
+
+# what `int` and `float` accept, for ASCII strings: optional whitespace (not the \x1c-\x1f
+# separators, which `str.isspace` counts), sign, digits with single underscores between them,
+# and for floats a fraction, an exponent, or `inf`/`infinity`/`nan` in any case
+_WS = r'\s*'
+_DIGITS = r'\d+(?:_\d+)*'
+_INT = rf'{_WS}[+-]?{_DIGITS}{_WS}'
+_FLOAT = (rf'{_WS}[+-]?(?:(?:{_DIGITS}(?:\.(?:{_DIGITS})?)?|\.{_DIGITS})(?:e[+-]?{_DIGITS})?'
+          rf'|inf(?:inity)?|nan){_WS}')
+# compiled on first use
+_SYNTAX: Dict[Any, Pattern[str]] = {}
+
+
+def _syntax(annotation: Any) -> Optional[Pattern[str]]:
+    if annotation is not int and annotation is not float:
+        return None
+    if not _SYNTAX:
+        import re
+        _SYNTAX[int] = re.compile(_INT, re.ASCII)
+        _SYNTAX[float] = re.compile(_FLOAT, re.ASCII | re.IGNORECASE)
+    return _SYNTAX[annotation]
+
+def _may_accept(annotation: Any) -> Optional[Callable[[Any], bool]]:
+    """
+    A cheap check for values the converter of `annotation` certainly fails on, if there is one.
+
+    It may accept values the converter then rejects (integers too long for `int`, non ASCII
+    digits), but never rejects one it would convert.
+    """
+    pattern = _syntax(annotation)
+    if pattern is not None:
+        fullmatch = pattern.fullmatch
+        return lambda value: type(value) is not str or not value.isascii() or fullmatch(value) is not None
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        names = frozenset(annotation._member_names_)
+        return lambda value: value in names
+    return None
+
+def compile_cast(key: str, annotation: Any) -> Converter:
+    """
+    Compile `annotation` into a function converting a single raw value.
+
+    The annotation is inspected once, here; the returned converter only does the
+    conversion, calling the pre-compiled converters of nested annotations directly.
+    """
+    origin = typing_get_origin(annotation)
+    args = typing_get_args(annotation)
+    if origin is Packed:
+        return _compile_packed(key, unpacked(annotation))
+    if origin == Union:
+        # members are tried in order, as before, but those whose check rejects the value are
+        # skipped without raising and catching an exception
+        options = [(compile_cast(key, arg), _may_accept(arg)) for arg in args]
+
+        def _union(value: Any) -> Any:
+            for convert, may_accept in options:
+                if may_accept is not None and not may_accept(value):
+                    continue
+                try:
+                    return convert(value)
+                except Exception:
+                    continue
+            return value
+        return _union
     elif origin in [list, tuple, List, Tuple]:
-        value = value.split(',')
-        if len(args):
-            value = [cast(key, i, args[0]) for i in value]
+        if not len(args):
+            return lambda value: value.split(',')
+        item = compile_cast(key, args[0])
+        if item is _identity:
+            return lambda value: value.split(',')
+        return lambda value: list(map(item, value.split(',')))
     elif origin == Repeated:
-        value = [cast(key, i, args[0]) for i in value]
+        item = compile_cast(key, args[0]) if len(args) else _identity
+        return lambda value: list(map(item, value))
+    elif origin in (Stream, AbcIterator):
+        item = compile_cast(key, args[0]) if len(args) else _identity
+        typename = getattr(args[0], '__name__', str(args[0])) if len(args) else 'str'
+        return lambda value: _stream(value, item, typename)
     elif annotation in [int, float]:
-        value = annotation(value)
+        return annotation  # type: ignore[no-any-return]
+    elif annotation is MappedFile:
+        return _map_file
     elif annotation is bool:
-        value = value.lower() in ['true', '1', 't', 'y', 'yes']
-    elif issubclass(annotation, enum.Enum):
-        if value not in annotation._member_names_:
-            raise InvalidChoice(key, value, annotation._member_names_)
-        value = annotation[value]
-    return value
+        return lambda value: value.lower() in _TRUTHY
+
+    try:
+        is_enum = issubclass(annotation, enum.Enum)
+    except TypeError as e:
+        message = str(e)
 
-def execute_command(c: Callable[..., Any], input_command: str) -> Any:
-    parsed, kwargs = parse(Namespace.from_callable(c), input_command)
+        def _unsupported(value: Any) -> Any:
+            raise TypeError(message)
+        return _unsupported
+
+    if is_enum:
+        names = annotation._member_names_
+
+        def _enum(value: Any) -> Any:
+            if value not in names:
+                raise InvalidChoice(key, value, names)
+            return annotation[value]
+        return _enum
+    return _identity
+
+def cast(key: str, value: Any, annotation: Any) -> Any:
+    return compile_cast(key, annotation)(value)
+
+# most recently used last. Trees refer to their root, so entries can't be weak references to
+# it; the bound keeps roots created per call (instances, dict literals) from piling up
+_compiled: 'OrderedDict[Tuple[int, bool, bool, bool, bool], Tuple[Any, Namespace]]' = OrderedDict()
+_MAX_COMPILED = 128
+
+def compile(c: Any, lazy: bool=False, reuse_instances: bool=False, snapshot: bool=False,
+            abbreviations: bool=False) -> Namespace:
+    """
+    Reflect `c` into a command tree, once.
+
+    Trees are cached by the identity of `c`, so calling `compile` (or `execute_command`)
+    repeatedly with the same object re-uses the tree built the first time; the trees of the
+    128 most recently used objects are kept. The returned
+    `Namespace` is shared between callers and must be treated as read-only; call
+    `invalidate` if `c` changes after it was compiled.
+
+    With `lazy=True` the tree is a `LazyNamespace`, which only reflects over the
+    branches that are actually dispatched into.
+
+    With `reuse_instances=True` every class in the tree is instantiated at most once,
+    the first time one of its methods is dispatched to; otherwise each dispatch gets a
+    fresh instance.
+
+    With `snapshot=True` the tree is loaded from an on-disk snapshot, which is written
+    the first time and whenever the source files of the tree change; see `water_cli.snapshot`.
+
+    With `abbreviations=True` every token of the command path may be shortened to any prefix
+    which is not shared with another name at the same level, so `db mig` runs `db migrate`;
+    a name which matches exactly always wins over one it is a prefix of.
+    """
+    key = (id(c), lazy, reuse_instances, snapshot, abbreviations)
+    entry = _compiled.get(key)
+    if entry is not None and entry[0] is c:
+        _compiled.move_to_end(key)
+        return entry[1]
+    if snapshot:
+        from water_cli.snapshot import load_or_build
+        ns = load_or_build(c, reuse_instances=reuse_instances, abbreviations=abbreviations)
+    else:
+        ns = Namespace.from_callable(c, lazy=lazy, reuse_instances=reuse_instances, abbreviations=abbreviations)
+    # keeping a reference to `c` guarantees its id is not re-used while cached
+    _compiled[key] = (c, ns)
+    if len(_compiled) > _MAX_COMPILED:
+        _compiled.popitem(last=False)
+    return ns
+
+def invalidate(c: Optional[Any] = None) -> None:
+    """
+    Drop the compiled trees for `c`, or every compiled tree if `c` is None.
+    """
+    if c is None:
+        _compiled.clear()
+        return
+    for key in [k for k, (obj, _) in _compiled.items() if obj is c]:
+        del _compiled[key]
+
+# hooks registered with `water_cli.profiling.add_hook`; mutated in place only
+_hooks: List[Callable[[Any], None]] = []
+
+def _tree(c: Any, lazy: bool, snapshot: bool) -> Namespace:
+    return c if isinstance(c, Namespace) else compile(c, lazy=lazy, snapshot=snapshot)
+
+def _timed(phases: List[Tuple[str, float]], phase: str, fn: Callable[..., T], *args: Any) -> T:
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        phases.append((phase, time.perf_counter() - start))
+
+def _execute_profiled(c: Any, tokens: List[str], lazy: bool, snapshot: bool) -> Any:
+    # the same steps as `execute_argv`, timed; see `water_cli.profiling`
+    phases: List[Tuple[str, float]] = []
+    path: Tuple[str, ...] = ()
+    try:
+        ns = _timed(phases, 'compile', _tree, c, lazy, snapshot)
+        _callable, i = _timed(phases, 'resolve', _resolve, ns, tokens)
+        path = tuple(tokens[:i])
+        tokenized = _timed(phases, 'tokenize', args_to_kwargs,
+                           islice(tokens, i, None), _callable.parse_spec().repeated)
+        kwargs = _timed(phases, 'parse', _check_args, _callable, tokenized)
+        casted = _timed(phases, 'cast', _cast_args, _callable, kwargs)
+        return _timed(phases, 'call', _dispatch, _callable, casted)
+    finally:
+        from water_cli.profiling import emit
+        emit(path, phases)
+
+def execute_argv(c: Any, tokens: List[str], lazy: bool=False, snapshot: bool=False) -> Any:
+    """
+    Run the command selected by `tokens`, an already split argument vector such as `sys.argv[1:]`.
+
+    Unless it is already a `Namespace`, `c` is compiled with `lazy` and `snapshot`; see `compile`.
+    """
+    if _hooks:
+        return _execute_profiled(c, tokens, lazy, snapshot)
+    ns = _tree(c, lazy, snapshot)
+    parsed, kwargs = _parse(ns, tokens)
     return apply_args(parsed, kwargs)
+
+def execute_command(c: Any, input_command: str) -> Any:
+    """
+    Run the command line `input_command`, which is split with shell-like syntax.
+    """
+    import shlex
+    return execute_argv(c, shlex.split(input_command))
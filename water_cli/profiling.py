@@ -0,0 +1,70 @@
+"""
+Timing of the phases of dispatching a command.
+
+Hooks added with `add_hook` receive a `PhaseEvent` for every phase of every command run
+through `execute_argv` (and so `execute_command` and `simple_cli`), in order:
+
+    compile    reflecting over the root, or finding its compiled tree
+    resolve    walking the tree to the command (reflection, in lazy trees)
+    tokenize   pairing up `--key value` tokens
+    parse      checking them against the parameters of the command
+    cast       converting the values
+    call       running the command
+
+Phases after one that raised are not reported (the one that raised is). Without hooks, dispatching is not timed
+at all. `simple_cli` prints a report to stderr when `WATER_PROFILE=1` is set.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, TextIO, Tuple
+
+# the parser only checks whether there are hooks, without importing this module
+from water_cli.parser import _hooks
+
+
+@dataclass(frozen=True)
+class PhaseEvent:
+    command: Tuple[str, ...]  # the tokens selecting the command, empty if it was not found
+    phase: str
+    duration: float  # seconds
+
+
+Hook = Callable[[PhaseEvent], None]
+
+
+def add_hook(hook: Hook) -> None:
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    _hooks.remove(hook)
+
+
+def emit(command: Tuple[str, ...], phases: Sequence[Tuple[str, float]]) -> None:
+    for phase, duration in phases:
+        event = PhaseEvent(command, phase, duration)
+        for hook in list(_hooks):
+            hook(event)
+
+
+class Report:
+    """
+    A hook collecting events, to print them with `write`.
+    """
+    def __init__(self) -> None:
+        self.events: List[PhaseEvent] = []
+
+    def __call__(self, event: PhaseEvent) -> None:
+        self.events.append(event)
+
+    def write(self, out: TextIO) -> None:
+        total = None
+        for event in self.events:
+            if event.phase == 'compile':  # the first phase of every command
+                if total is not None:
+                    out.write(f'  {"total":<10}{total * 1e3:10.3f} ms\n')
+                total = 0.0
+                out.write(f'water profile: {" ".join(event.command) or "(no command)"}\n')
+            total = (total or 0.0) + event.duration
+            out.write(f'  {event.phase:<10}{event.duration * 1e3:10.3f} ms\n')
+        if total is not None:
+            out.write(f'  {"total":<10}{total * 1e3:10.3f} ms\n')
@@ -0,0 +1,392 @@
+"""
+On-disk snapshots of command trees.
+
+Reflecting over a big tree (importing every module, reading every signature) is
+most of the start up time of a short lived command line program. A snapshot is
+that reflection, done once and stored as JSON in the user's cache directory:
+names, parameter kinds, defaults, annotations and docstrings.
+
+Snapshots are keyed by the root object and the water version, and are only
+used while the modification times of every source file that contributed to
+them are unchanged; otherwise the tree is reflected over again and the
+snapshot re-written.
+
+A tree loaded from a snapshot parses arguments without importing anything.
+Classes and functions are looked up (and their modules imported) only once a
+command is dispatched into, and only along the dispatched path; the real
+signature is read again at that point, to cast the arguments.
+"""
+import enum
+import inspect
+import json
+import os
+import sys
+import zlib
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from water_cli.parser import (Flag, MCallable, Namespace, Packed, Repeated, Stream, Converter, constraints_of,
+                              _instance_member, import_string, is_stream, typing_get_args, typing_get_origin)
+
+_FORMAT = 3
+
+_SIMPLE_TYPES: Dict[str, Any] = {t.__name__: t for t in (int, float, str, bool, bytes, type(None))}
+_CONTAINERS: Dict[str, Any] = {'list': List, 'tuple': Tuple, 'union': Union, 'repeated': Repeated, 'stream': Stream,
+                               'packed': Packed}
+_EMPTY = inspect.Parameter.empty
+
+
+class Unresolved:
+    """
+    Stands in for an annotation, or a default value, that can't be stored in a snapshot.
+
+    Only which arguments are flags, repeated or required matters before a command is
+    dispatched; annotations are read again from the function itself to cast arguments.
+    """
+    def __init__(self, description: str) -> None:
+        self.description = description
+
+    def __repr__(self) -> str:
+        return f'Unresolved({self.description!r})'
+
+
+def cache_dir() -> str:
+    """
+    Where snapshots are stored: `$WATER_CACHE_DIR`, or `water_cli` under `$XDG_CACHE_HOME`
+    (`~/.cache` when unset).
+    """
+    override = os.environ.get('WATER_CACHE_DIR')
+    if override:
+        return override
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'water_cli')
+
+
+def _ref(obj: Any) -> str:
+    if inspect.ismodule(obj):
+        return obj.__name__
+    return f'{obj.__module__}:{obj.__qualname__}'
+
+
+def _root_id(c: Any) -> Any:
+    if isinstance(c, Mapping):
+        return {k: v if isinstance(v, str) else _root_id(v) for k, v in c.items()}
+    if inspect.ismodule(c) or inspect.isclass(c) or inspect.isfunction(c):
+        return _ref(c)
+    return _ref(type(c)) + '()'
+
+
+def snapshot_path(c: Any) -> str:
+    """
+    The file the snapshot of `c` is stored in.
+    """
+    return os.path.join(cache_dir(), f'{zlib.crc32(_key(c).encode()):08x}.json')
+
+
+def _key(c: Any) -> str:
+    from water_cli import __version__
+    main_file = getattr(sys.modules.get('__main__'), '__file__', None)
+    return json.dumps([_root_id(c), main_file, __version__], sort_keys=True)
+
+
+def describe(annotation: Any) -> Dict[str, Any]:
+    """
+    A JSON serializable description of `annotation`; see `annotation_from`.
+    """
+    if annotation is _EMPTY:
+        return {'type': 'empty'}
+    if annotation is Flag:
+        return {'type': 'flag'}
+    if _SIMPLE_TYPES.get(getattr(annotation, '__name__', '')) is annotation:
+        return {'type': annotation.__name__}
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return {'type': 'enum', 'ref': _ref(annotation), 'choices': list(annotation._member_names_)}
+
+    origin = typing_get_origin(annotation)
+    args = [describe(a) for a in typing_get_args(annotation)]
+    if origin is Union:
+        return {'type': 'union', 'args': args}
+    if origin is Repeated:
+        return {'type': 'repeated', 'args': args}
+    if origin is Packed:
+        return {'type': 'packed', 'args': args}
+    if is_stream(annotation):
+        return {'type': 'stream', 'args': args}
+    if origin in [list, List]:
+        return {'type': 'list', 'args': args}
+    if origin in [tuple, Tuple]:
+        return {'type': 'tuple', 'args': args}
+    return {'type': 'other', 'repr': repr(annotation)}
+
+
+def annotation_from(description: Dict[str, Any]) -> Any:
+    """
+    Rebuild an annotation from `describe`. Enums and anything `describe` doesn't know
+    about are not imported, they become `Unresolved`.
+    """
+    kind = description['type']
+    if kind == 'empty':
+        return _EMPTY
+    if kind == 'flag':
+        return Flag
+    if kind in _SIMPLE_TYPES:
+        return _SIMPLE_TYPES[kind]
+    if kind in _CONTAINERS:
+        args = tuple(annotation_from(a) for a in description['args'])
+        if not args:
+            return {'list': list, 'tuple': tuple}.get(kind, _CONTAINERS[kind])
+        return _CONTAINERS[kind][args if len(args) > 1 else args[0]]
+    return Unresolved(description.get('ref', description.get('repr', kind)))
+
+
+def _module_file(obj: Any) -> Optional[str]:
+    module = obj if inspect.ismodule(obj) else sys.modules.get(getattr(obj, '__module__', None) or '')
+    path = getattr(module, '__file__', None)
+    return os.path.abspath(path) if path else None
+
+
+def _dump_parameter(p: inspect.Parameter) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {'name': p.name, 'kind': p.kind.name, 'annotation': describe(p.annotation)}
+    if p.default is not _EMPTY:
+        if p.default is None or isinstance(p.default, (bool, int, float, str)):
+            entry['default'] = p.default
+        else:
+            entry['default_repr'] = repr(p.default)
+    return entry
+
+
+def _dump_callable(c: MCallable, files: Set[str]) -> Dict[str, Any]:
+    path = _module_file(c.target)
+    if path:
+        files.add(path)
+    return {'name': c.name, 'bind': c.bind, 'doc': inspect.getdoc(c.target),
+            'args': [_dump_parameter(p) for p in c.args],
+            'constraints': [[kind, list(names)] for kind, names in c.constraints],
+            'cache': None if c.cache is None else [c.cache.ttl, c.cache.max_entries]}
+
+
+def _dump_namespace(ns: Namespace, files: Set[str]) -> Dict[str, Any]:
+    doc = None
+    if ns.source is not None and not isinstance(ns.source, Mapping):
+        path = _module_file(ns.source)
+        if path:
+            files.add(path)
+        doc = inspect.getdoc(ns.source)
+    return {'name': ns.name, 'doc': doc, 'options': ns.option_names(),
+            'members': [_dump_namespace(m, files) for m in ns.members],
+            'callables': [_dump_callable(c, files) for c in ns.callables]}
+
+
+def dump(ns: Namespace, key: str = '') -> Dict[str, Any]:
+    """
+    The snapshot of the (eagerly reflected) tree `ns`, identified by `key`.
+    """
+    from water_cli import __version__
+    files: Set[str] = set()
+    tree = _dump_namespace(ns, files)
+    tree['function'] = ns.source is None and len(ns.callables) == 1 and not ns.members
+    mtimes = {}
+    for path in sorted(files):
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return {'format': _FORMAT, 'version': __version__, 'key': key, 'files': mtimes, 'tree': tree}
+
+
+def _is_fresh(data: Dict[str, Any], key: str) -> bool:
+    from water_cli import __version__
+    # file names are a short hash of the key, which may collide
+    if data.get('format') != _FORMAT or data.get('version') != __version__ or data.get('key') != key:
+        return False
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in data['files'].items())
+    except OSError:
+        return False
+
+
+def _lookup(source: Any, name: str) -> Any:
+    if isinstance(source, Mapping):
+        value = source[name]
+        return import_string(value) if isinstance(value, str) else value
+    return getattr(source, name)
+
+
+class SnapshotCallable(MCallable):
+    """
+    An `MCallable` read from a snapshot; `target` is looked up on first access.
+    """
+    def __init__(self, node: Dict[str, Any], parent: Namespace, resolve: Callable[[], Any]) -> None:
+        self.name = node['name']
+        self.parent = parent
+        self.bind = node['bind']
+        self.args = [_parameter(p) for p in node['args']]
+        self.constraints = tuple((kind, tuple(names)) for kind, names in node['constraints'])
+        self.cache = None
+        if node['cache'] is not None:
+            from water_cli.cache import CachePolicy
+            self.cache = CachePolicy(*node['cache'])
+        self._resolve = resolve
+        self._target: Any = None
+        self._plan = None
+        self._spec = None
+        self._suggestions = None
+
+    @property
+    def target(self) -> Any:
+        if self._target is None:
+            resolved = self._resolve()
+            constraints = constraints_of(resolved)  # checked from the snapshot instead
+            self._target = resolved if constraints is None else constraints.target
+        return self._target
+
+    @target.setter
+    def target(self, value: Any) -> None:
+        self._target = value
+
+    def cast_plan(self) -> Dict[str, Tuple[Converter, str]]:
+        if self._plan is None:
+            # the snapshot only describes annotations; cast with the real ones
+            real = MCallable.from_callable(self.target, self.name, self.parent, bind=self.bind)
+            self._plan = real.cast_plan()
+        return self._plan
+
+
+def _parameter(p: Dict[str, Any]) -> inspect.Parameter:
+    default: Any = _EMPTY
+    if 'default' in p:
+        default = p['default']
+    elif 'default_repr' in p:
+        default = Unresolved(p['default_repr'])
+    return inspect.Parameter(p['name'], getattr(inspect.Parameter, p['kind']),
+                             default=default, annotation=annotation_from(p['annotation']))
+
+
+class SnapshotNamespace(Namespace):
+    """
+    A `Namespace` read from a snapshot. Children are built when they are looked up, and
+    `source` is only resolved (from the parent's source) when an instance is needed.
+    """
+    def __init__(self, node: Dict[str, Any], resolve: Callable[[], Any], parent: Optional[Namespace]=None,
+                 reuse_instances: bool=False, abbreviations: bool=False) -> None:
+        self.name = node['name']
+        self.parent = parent
+        self.reuse_instances = reuse_instances
+        self.abbreviations = abbreviations
+        self._instance = None
+        self._by_name = None
+        self._prefixes = None
+        self._suggestions = None
+        self._node = node
+        self._resolve = resolve
+        self._source: Any = None
+        self._resolved = False
+        self._index: Optional[Dict[str, Tuple[bool, Dict[str, Any]]]] = None
+        self._found: Dict[str, Union[Namespace, MCallable]] = {}
+
+    @property
+    def source(self) -> Any:
+        if not self._resolved:
+            self._source = self._resolve()
+            self._resolved = True
+        return self._source
+
+    @source.setter
+    def source(self, value: Any) -> None:
+        self._source = value
+        self._resolved = True
+
+    @property  # type: ignore[override]
+    def members(self) -> List[Namespace]:
+        return [m for m in (self.find(n['name']) for n in self._node['members']) if isinstance(m, Namespace)]
+
+    @members.setter
+    def members(self, value: List[Namespace]) -> None:
+        raise AttributeError('Snapshot trees are read-only')
+
+    @property  # type: ignore[override]
+    def callables(self) -> List[MCallable]:
+        return [c for c in (self.find(n['name']) for n in self._node['callables']) if isinstance(c, MCallable)]
+
+    @callables.setter
+    def callables(self, value: List[MCallable]) -> None:
+        raise AttributeError('Snapshot trees are read-only')
+
+    def option_names(self) -> List[str]:
+        return list(self._node['options'])
+
+    def find(self, name: str) -> Optional[Union[Namespace, MCallable]]:
+        if name in self._found:
+            return self._found[name]
+        if self._index is None:
+            # members take precedence over callables, as in `Namespace.find`
+            self._index = {n['name']: (False, n) for n in self._node['callables']}
+            self._index.update({n['name']: (True, n) for n in self._node['members']})
+        entry = self._index.get(name)
+        if entry is None:
+            # snapshots only record the attributes of classes
+            from_instance = _instance_member(self, name, lazy=True)
+            if from_instance is not None:
+                self._found[name] = from_instance
+                return from_instance
+            full = self.expand(name) if self.abbreviations else None
+            return None if full is None else self.find(full)
+
+        is_member, node = entry
+        found: Union[Namespace, MCallable]
+        if is_member:
+            found = SnapshotNamespace(node, lambda: _lookup(self.source, name), parent=self,
+                                      reuse_instances=self.reuse_instances, abbreviations=self.abbreviations)
+        elif self._node.get('function'):
+            found = SnapshotCallable(node, self, self._resolve)
+        else:
+            found = SnapshotCallable(node, self, lambda: _lookup(self.source, name))
+        self._found[name] = found
+        return found
+
+
+def load(data: Dict[str, Any], c: Any, reuse_instances: bool=False, abbreviations: bool=False) -> Namespace:
+    """
+    The tree described by the snapshot `data`, dispatching into `c`.
+    """
+    return SnapshotNamespace(data['tree'], lambda: c, reuse_instances=reuse_instances, abbreviations=abbreviations)
+
+
+def _write(path: str, data: Dict[str, Any]) -> None:
+    import tempfile
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_or_build(c: Any, reuse_instances: bool=False, abbreviations: bool=False) -> Namespace:
+    """
+    The tree for `c`, loaded from its snapshot when that is fresh.
+
+    Otherwise `c` is reflected over (eagerly, to see the whole tree) and its snapshot
+    is written; failing to write it is not an error, the next run tries again.
+    """
+    key = _key(c)
+    path = snapshot_path(c)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if _is_fresh(data, key):
+            return load(data, c, reuse_instances=reuse_instances, abbreviations=abbreviations)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    ns = Namespace.from_callable(c, reuse_instances=reuse_instances, abbreviations=abbreviations)
+    try:
+        _write(path, dump(ns, key))
+    except OSError:
+        pass
+    return ns
@@ -0,0 +1,90 @@
+"""
+Ranked "did you mean" suggestions for mistyped command and parameter names.
+
+`SuggestionIndex` is a deletion index, as in SymSpell: every name is stored under itself
+and under each string obtained by deleting one of its characters. A query looks up itself
+and the strings obtained by deleting up to two of its characters, which finds every name
+within one edit of it (and most within two) without comparing it against every name.
+
+A query with `k` characters deleted matching a name with `m` deleted bounds their edit
+distance by `k + m`, so candidates are ranked in order of that bound and the exact
+distance is only computed for as many of them as the ranking needs.
+"""
+from collections import defaultdict
+from typing import DefaultDict, Iterable, List, Set, Tuple
+
+MAX_DISTANCE = 2
+
+
+def _deletes(word: str) -> Set[str]:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def distance(a: str, b: str) -> int:
+    """
+    Edit distance between `a` and `b`, counting insertions, deletions, substitutions and
+    transpositions of adjacent characters.
+    """
+    previous: List[int] = []
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+    return row[-1]
+
+
+def _one_edit(a: str, b: str) -> bool:
+    # whether `a != b` are one edit apart, without filling in the whole table of `distance`
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    return (a[i + 1:] == b[i + 1:] or a[i + 1:] == b[i:] or a[i:] == b[i + 1:]
+            or (a[i:i + 2] == b[i + 1:i - 1 if i else None:-1] and a[i + 2:] == b[i + 2:]))
+
+
+class SuggestionIndex:
+    def __init__(self, names: Iterable[str]) -> None:
+        self._names = set(names)
+        # string -> names one deletion away from it
+        self._deleted: DefaultDict[str, List[str]] = defaultdict(list)
+        for name in self._names:
+            for variant in _deletes(name):
+                self._deleted[variant].append(name)
+
+    def _candidates(self, word: str) -> List[Set[str]]:
+        # names found for `word`, by the upper bound of their distance to it
+        buckets: List[Set[str]] = [set() for _ in range(MAX_DISTANCE + 2)]
+        level = {word}
+        for k in range(MAX_DISTANCE + 1):
+            buckets[k].update(level & self._names)
+            for variant in level:
+                if variant in self._deleted:
+                    buckets[k + 1].update(self._deleted[variant])
+            if k < MAX_DISTANCE:
+                level = {shorter for variant in level for shorter in _deletes(variant)}
+        seen = {word}
+        for bucket in buckets:
+            bucket -= seen
+            seen |= bucket
+        return buckets
+
+    def suggest(self, word: str, limit: int = 3) -> List[str]:
+        """
+        Up to `limit` names closest to `word`, nearest first and then by name. Names more than
+        `MAX_DISTANCE` edits away, or as many edits away as `word` is long, are left out.
+        """
+        ranked: List[Tuple[int, str]] = []
+        for bound, bucket in enumerate(self._candidates(word)):
+            # every name within one edit has a bound of at most 2
+            lowest = 1 if bound <= 2 else 2
+            if sum(1 for d, _ in ranked if d < lowest) >= limit:
+                break
+            if bound <= 2:
+                ranked.extend((1 if bound == 1 or _one_edit(word, name) else 2, name) for name in bucket)
+            else:
+                ranked.extend((distance(word, name), name) for name in bucket)
+        ranked.sort()
+        return [name for d, name in ranked if d <= MAX_DISTANCE and d < len(word)][:limit]
@@ -1,17 +1,26 @@
+from __future__ import annotations
+
+import io
+import os
 import sys
-import shlex
+from collections.abc import Iterator
 from functools import wraps
-from typing import List, Any, Tuple, Dict, Iterable, Callable, TypeVar, Any
-if sys.version_info < (3, 10):
-    from typing_extensions import ParamSpec
-else:
-    from typing import ParamSpec
-from water_cli.parser import Flag, MCallable, execute_command
+from typing import List, Any, Tuple, Dict, Iterable, Callable, TypeVar, Any, NoReturn, TYPE_CHECKING
+from water_cli.parser import Check, Constraints, Flag, MCallable, args_to_kwargs, constraints_of, execute_argv
 from water_cli.exceptions import ExclusiveFlags, MissingRequiredCombination
 import water_cli.exceptions
 
-R = TypeVar('R')
-P = ParamSpec('P')
+# batch execution, profiling and typing_extensions are imported when they are used,
+# to keep them out of the start up time of every command
+if TYPE_CHECKING:
+    if sys.version_info < (3, 10):
+        from typing_extensions import ParamSpec
+    else:
+        from typing import ParamSpec
+    from water_cli.batch import BatchResult
+
+    R = TypeVar('R')
+    P = ParamSpec('P')
 
 def _check_kwargs_together(kwargs: Dict[str, Any], flags_list: List[Tuple[str, ...]]) -> None:
     provided_keys = set()
@@ -51,6 +60,15 @@ def _check_kwargs_exclusive(kwargs: Dict[str, Any], flags_list: List[Tuple[str,
     return
 
 
+def _attach_constraints(wrapped: Callable[P, R], f: Callable[P, R], checks: Iterable[Check]) -> Callable[P, R]:
+    # water checks these while parsing and calls the undecorated function; see `Constraints`
+    inner = constraints_of(f)
+    target = f if inner is None else inner.target
+    outer = tuple(checks) + (() if inner is None else inner.checks)
+    setattr(wrapped, '__water_constraints__', Constraints(wrapped, target, outer))
+    return wrapped
+
+
 def exclusive_flags(_flags_list: List[Tuple[str, ...]]) -> Any:
 
     def wrapper(f: Callable[P, R]) -> Callable[P, R]:
@@ -61,7 +79,7 @@ def exclusive_flags(_flags_list: List[Tuple[str, ...]]) -> Any:
         def wrapped(*args: P.args, **kwargs: P.kwargs) -> R:
             _check_kwargs_exclusive(kwargs, _flags_list)
             return f(*args, **kwargs)
-        return wrapped
+        return _attach_constraints(wrapped, f, [('exclusive', tuple(pairs)) for pairs in _flags_list])
 
     return wrapper
 
@@ -84,16 +102,166 @@ def required_together(_flags_list: List[Tuple[str, ...]]) -> Any:
         def wrapped(*args: P.args, **kwargs: P.kwargs) -> R:
             _check_kwargs_together(kwargs, _flags_list)
             return f(*args, **kwargs)
-        return wrapped
+        return _attach_constraints(wrapped, f, [('together', tuple(pairs)) for pairs in _flags_list])
 
     return wrapper
 
-def simple_cli(c: Callable[..., Any]) -> None:
+def _print_error(e: water_cli.exceptions.BadArguments, prefix: str = '') -> None:
+    if isinstance(e, water_cli.exceptions.BadSubcommand) and e.suggestions:
+        print(f'{prefix}{e}', 'Did you mean:', ', '.join(e.suggestions) + '?')
+    elif isinstance(e, water_cli.exceptions.BadSubcommand):
+        print(f'{prefix}{e}', 'Try any of:', e.valid_options)
+    elif isinstance(e, water_cli.exceptions.UnexpectedParameters) and any(e.suggestions.values()):
+        hints = [f'--{e.suggestions[p][0]} instead of --{p}' for p in e.params if e.suggestions.get(p)]
+        print(f'{prefix}{e}.', 'Did you mean', ' and '.join(hints) + '?')
+    else:
+        print(f'{prefix}{e}')
+
+
+def _run_batch(c: Any, args: List[str]) -> None:
+    from water_cli.batch import execute_batch
+
+    if not args or args[0].startswith('--'):
+        print('--batch takes a file with one command per line, or - for stdin')
+        return
+
+    try:
+        options = dict(args_to_kwargs(args[1:]))
+        missing = [k for k, v in options.items() if v is None]
+        if missing:
+            raise water_cli.exceptions.MissingValues(missing)
+        batch_options: Dict[str, Any] = {}
+        for name, convert in [('concurrency', int), ('executor', str), ('workers', int), ('chunksize', int)]:
+            if name in options:
+                batch_options[name] = convert(options.pop(name))
+        if options:
+            raise water_cli.exceptions.UnexpectedParameters(sorted(options))
+        # validates the options; nothing is read from `lines` until the results are iterated
+        execute_batch(c, [], **batch_options)
+    except ValueError as e:
+        print(f'Invalid --batch options: {e}')
+        return
+
+    if args[0] == '-':
+        # the commands are stdin: streams without a value read an empty one instead of the
+        # rest of the batch, as in `water_cli.daemon`
+        stdin, sys.stdin = sys.stdin, io.StringIO()
+        try:
+            _print_batch(execute_batch(c, stdin, **batch_options))
+        finally:
+            sys.stdin = stdin
+        return
+    try:
+        f = open(args[0])
+    except OSError as e:
+        print(f'--batch takes a file with one command per line, or - for stdin: {e.strerror}: {args[0]}')
+        return
+    with f:
+        _print_batch(execute_batch(c, f, **batch_options))
+
+
+def _write_result(res: Any) -> None:
+    if isinstance(res, Iterator):
+        # generators and other iterators are streamed, one item per line
+        sys.stdout.writelines(f'{item}\n' for item in res)
+    elif res is not None:
+        print(res)
+
+
+def _stdout_closed() -> NoReturn:
+    # the reader went away (`tool export | head`); point stdout at devnull so
+    # flushing it again at exit doesn't raise too
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def _print_result(res: Any) -> None:
+    try:
+        _write_result(res)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        _stdout_closed()
+
+
+def _print_batch(results: Iterable[BatchResult]) -> None:
     try:
-        res = execute_command(c, shlex.join(sys.argv[1:]))
-        if res is not None:
-            print(res)
-    except water_cli.exceptions.BadSubcommand as bs:
-        print(bs, 'Try any of:', bs.valid_options)
+        for r in results:
+            if r.error is not None:
+                _print_error(r.error, prefix=f'line {r.line_number}: ')
+            else:
+                _write_result(r.result)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        _stdout_closed()
+
+
+def run_cli(c: Any, argv: List[str], snapshot: bool = False) -> None:
+    """
+    Run the command selected by `argv`, printing its result or the reason it could not run.
+    Iterators and generators are printed one item per line, as they are produced.
+
+    `--batch FILE` (or `--batch -` for stdin) runs every line of `FILE` as a command instead,
+    where streams not given a value read nothing rather than the batch's stdin;
+    `--concurrency N` after it runs up to N `async def` commands at a time, and
+    `--executor thread|process [--workers N] [--chunksize N]` runs commands on a pool.
+
+    With `snapshot=True` single commands are dispatched through the on-disk snapshot of
+    the tree (see `compile`); batches only reflect once anyway, and don't use it.
+    """
+    if argv[:1] == ['--batch']:
+        _run_batch(c, argv[1:])
+        return
+
+    try:
+        res = execute_argv(c, argv, lazy=True, snapshot=snapshot)
+        _print_result(res)
     except water_cli.exceptions.BadArguments as e:
-        print(e)
+        _print_error(e)
+
+
+def simple_cli(c: Any, snapshot: bool = False) -> None:
+    """
+    Run `c` as a command line program, with the arguments in `sys.argv`; see `run_cli`.
+
+    `--serve SOCKET` keeps `c` loaded and serves commands over a Unix socket instead;
+    see `water_cli.daemon`.
+
+    `--completion bash|zsh|fish` prints a shell completion script; see `water_cli.completion`.
+
+    With `WATER_PROFILE=1` in the environment, the time spent in every phase of running
+    the command is printed to stderr; see `water_cli.profiling`.
+
+    `--no-cache`, before anything else, runs commands decorated with `water_cli.cached`
+    without reading or storing cached results.
+    """
+    argv = sys.argv[1:]
+    if argv[:1] == ['--no-cache']:
+        from water_cli.cache import disabled
+        with disabled():
+            _simple_cli(c, argv[1:], snapshot)
+        return
+    _simple_cli(c, argv, snapshot)
+
+
+def _simple_cli(c: Any, argv: List[str], snapshot: bool) -> None:
+    if argv[:1] == ['--serve']:
+        from water_cli.daemon import serve_cli
+        serve_cli(c, argv[1:])
+        return
+    if argv[:1] in (['--completion'], ['--completion-index']):
+        from water_cli.completion import completion_cli
+        completion_cli(c, argv)
+        return
+    if os.environ.get('WATER_PROFILE') != '1':
+        run_cli(c, argv, snapshot=snapshot)
+        return
+
+    from water_cli.profiling import Report, add_hook, remove_hook
+    report = Report()
+    add_hook(report)
+    try:
+        run_cli(c, argv, snapshot=snapshot)
+    finally:
+        remove_hook(report)
+        report.write(sys.stderr)